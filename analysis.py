@@ -3,6 +3,8 @@ import matplotlib.pyplot as plt
 import matplotlib.ticker as ticker
 from fnmatch import fnmatch
 import argparse
+import numpy as np
+from time_series import TimeSeries, Better, RegularColumn
 
 class ReadableNumber(object):
     def __init__(self, num):
@@ -107,124 +109,96 @@ def statistics(records, start, end, type):
                 a = ReadableNumber(a)
             return a
 
-        print("  max:", __post_process(max(data)))
-        print("  min:", __post_process(min(data)))
-        print("  avg:", __post_process(sum(data)/len(data)))
-
-
-class Metric(object):
-    def __init__(self, cnt, bw):
-        self.cnt = cnt
-        self.bw = bw
-
-    def __str__(self):
-        return r'{cnt: %d, bw: %d}' % (self.cnt, self.bw)
-
-    def get_bw(self):
-        return self.bw
-
-    def get_cnt(self):
-        return self.cnt
-
-
-class Record(object):
-    def __init__(self):
-        self.metric = {}
-
-    def __str__(self):
-        ret = ''
-        for m in self.metric:
-            ret += '' + m + ': ' + self.metric[m].__str__() + ', '
-        return ret[:-2]
-
-    def add_metric(self, name, val):
-        self.metric[name] = val
-
-    def get_metric(self, name):
-        return self.metric[name]
-
-    def get_metrics(self):
-        return self.metric
+        print("  max:", __post_process(np.nanmax(data)))
+        print("  min:", __post_process(np.nanmin(data)))
+        print("  avg:", __post_process(np.nanmean(data)))
 
 
 class RecordList(object):
-    def __init__(self, interval, raw_path):
-        self.list = []
+    """
+    Records of a perf stat csv as one numpy array per series, named
+    <metric>_bw and <metric>_cnt. A metric missing from a record is nan.
+    """
+    def __init__(self, interval, raw_path, columns, length):
         self.interval = interval
         self.raw_path = raw_path
+        self.columns = columns
+        self.length = length
+        # filter to the series it selects
+        self.filter_cache = {}
 
     def __str__(self):
-        ret = 'interval: %d ms, length: %d' % (self.interval, len(self.list))
-        ret += ', '
-        for r in self.list:
-            ret += r.__str__() + ', '
-        return ret[:-2]
+        ret = 'interval: %d ms, length: %d' % (self.interval, self.length)
+        for name in self.columns:
+            ret += ', ' + name + ': ' + str(self.columns[name])
+        return ret
 
     def get_raw_path(self):
         return self.raw_path
 
-    def append(self, record):
-        self.list.append(record)
-
     def get_metric_series(self, filter='*'):
-        series = {}
-        post_process = lambda a: a
-        for r in self.list:
-            m = r.get_metrics()
-            for m_name in m:
-                name = m_name + '_bw'
+        series = self.filter_cache.get(filter)
+        if series is None:
+            series = {}
+            for name in self.columns:
                 if fnmatch(name, filter):
-                    if name not in series.keys():
-                        series[name] = []
-                    # do some data post process
-                    if fnmatch(name, '*bus-access*'):
-                        post_process = lambda a: a * args.bus_access_width
-                    elif fnmatch(name, '*cpu-cycles*'):
-                        post_process = lambda a : a * 1000000000
-                    series[name].append(post_process(m[m_name].get_bw()))
-                name = m_name + '_cnt'
-                if fnmatch(name, filter):
-                    if name not in series.keys():
-                        series[name] = []
-                    series[name].append(post_process(m[m_name].get_cnt()))
-        if args.normalize:
-            for name in series:
-                series[name] = [x / max(series[name]) for x in series[name]]
+                    series[name] = self.columns[name]
+                    if args.normalize:
+                        series[name] = series[name] / np.nanmax(series[name])
+            self.filter_cache[filter] = series
         return series
 
+    def get_time_series(self, filter='*'):
+        """
+        Series of get_metric_series as TimeSeries, a record every interval ms.
+        """
+        all_series = {}
+        for name, values in self.get_metric_series(filter).items():
+            series = TimeSeries(None, values, '/s' if name.endswith('_bw') else '', Better.HIGHER)
+            series.timestamp = RegularColumn(start=0, step=self.interval * 1000 * 1000, size=len(values))
+            all_series[name] = series
+        return all_series
 
     def get_metric_series_name(self):
-        names = []
-        m = self.list[0].get_metrics()
-        for m_name in m:
-            names.append(m_name + '_bw')
-            names.append(m_name + '_cnt')
-        return names
-
+        return list(self.columns)
 
     def get_total_ms(self):
-        return len(self.list) * self.interval
+        return self.length * self.interval
 
     def get_interval_ms(self):
         return self.interval
 
 
 def open_perf_stat_csv(file_path):
-    record_list = RecordList(args.interval, file_path)
+    # index of the record, name, count and bandwidth of each metric row
+    record_index = []
+    names = []
+    cnts = []
+    bws = []
+    length = 0
 
     with open(file_path, newline='') as csvfile:
         reader = csv.reader(csvfile, delimiter=',')
         record = None
         for row in reader:
             # skip useless rows
+            if len(row) == 0:
+                continue
             if row[0] == 'Performance counter statistics':
-                record = Record()
+                record = []
                 continue
             elif row[0] == 'Total test time':
-                record_list.append(record)
+                if record is not None:
+                    for name, cnt, bw in record:
+                        record_index.append(length)
+                        names.append(name)
+                        cnts.append(cnt)
+                        bws.append(bw)
+                    length += 1
+                    record = None
                 continue
 
-            if len(row) < 5:
+            if len(row) < 5 or record is None:
                 continue
 
             cnt = int(row[0])
@@ -236,9 +210,33 @@ def open_perf_stat_csv(file_path):
             elif unit == 'M/sec':
                 bw *= 1000 * 1000
 
-            record.add_metric(name, Metric(cnt, bw))
-
-        return record_list
+            record.append((name, cnt, bw))
+
+    metric_names = list(dict.fromkeys(names))
+    position = {name: i for i, name in enumerate(metric_names)}
+    index = (np.array([position[name] for name in names], dtype=np.int64), np.array(record_index, dtype=np.int64))
+    cnt = np.zeros((len(metric_names), length), dtype=np.int64)
+    cnt[index] = cnts
+    bw = np.full((len(metric_names), length), np.nan)
+    bw[index] = bws
+    # counts stay integers unless a record misses a metric
+    missing = np.isnan(bw)
+    if missing.any():
+        cnt = cnt.astype(np.float64)
+        cnt[missing] = np.nan
+
+    columns = {}
+    for i, name in enumerate(metric_names):
+        # do some data post process
+        scale = 1
+        if fnmatch(name, '*bus-access*'):
+            scale = args.bus_access_width
+        elif fnmatch(name, '*cpu-cycles*'):
+            scale = 1000000000
+        columns[name + '_bw'] = bw[i] * scale
+        columns[name + '_cnt'] = cnt[i] * scale
+
+    return RecordList(args.interval, file_path, columns, length)
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser()
@@ -0,0 +1,119 @@
+import os
+import json
+import struct
+import functools
+import numpy as np
+from time_series import TimeSeries
+from time_series import Better
+from time_series import LazySeries
+from time_series import RegularColumn
+
+# Layout of a binary series file:
+#   MAGIC, version (uint32), index length (uint32), index, padding
+#   columns, each starting at a multiple of ALIGNMENT
+# The index is JSON with, for each series, its name, unit, better, count and
+# its data and timestamp columns as the offset from the first column and the
+# dtype, or start and step for regular timestamps, or null without timestamps.
+MAGIC = b'PASERIES'
+VERSION = 1
+HEADER = struct.Struct('<8sII')
+ALIGNMENT = 64
+
+
+def align(size):
+	return (size + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def is_binary_series(path):
+	with open(path, 'rb') as f:
+		return f.read(len(MAGIC)) == MAGIC
+
+
+def save(path, all_series, prefix=""):
+	"""
+	Write the series into a binary series file. Like the text format, series
+	are added to those already in the file, which is then rewritten.
+	"""
+	if os.path.exists(path):
+		if not is_binary_series(path):
+			raise ValueError(f'{path} exists and is not a binary series file')
+		importer = BinarySeriesImporter()
+		importer.import_from_path(path)
+		old_series = importer.get_all_series()
+	else:
+		old_series = {}
+	new_series = {f'{prefix}.{name}' if prefix else name: series for name, series in all_series.items()}
+	merged = {name: series for name, series in old_series.items() if name not in new_series}
+	merged.update(new_series)
+
+	index = []
+	columns = []
+	size = 0
+	for name, series in merged.items():
+		entry = {"name": name, "unit": series.get_unit(), "better": series.get_better().name, "count": series.count(), "timestamp": None}
+		if series.is_timestamp_valid():
+			column = series.timestamp
+			if column.regular:
+				entry["timestamp"] = {"start": int(column.start), "step": int(column.step)}
+			else:
+				columns.append(column.view())
+				entry["timestamp"] = {"offset": size, "dtype": columns[-1].dtype.str}
+				size = align(size + columns[-1].nbytes)
+		columns.append(series.get_data_series())
+		entry["data"] = {"offset": size, "dtype": columns[-1].dtype.str}
+		size = align(size + columns[-1].nbytes)
+		index.append(entry)
+
+	encoded_index = json.dumps(index).encode()
+	header = HEADER.pack(MAGIC, VERSION, len(encoded_index)) + encoded_index
+	tmp_path = f'{path}.{os.getpid()}.tmp'
+	with open(tmp_path, 'wb') as f:
+		f.write(header + bytes(align(len(header)) - len(header)))
+		for values in columns:
+			np.ascontiguousarray(values).tofile(f)
+			f.write(bytes(align(values.nbytes) - values.nbytes))
+	# the old series map the file, drop them before replacing it
+	columns.clear()
+	merged.clear()
+	old_series.clear()
+	os.replace(tmp_path, path)
+
+
+class BinarySeriesImporter:
+	"""
+	Importer of binary series files. The file is mapped in memory and a
+	series only reads its columns when first used.
+	"""
+	def __init__(self):
+		self.all_series = {}
+
+	def import_from_path(self, path, offset=0):
+		buffer = np.memmap(path, dtype=np.uint8, mode='r')
+		magic, version, index_size = HEADER.unpack(bytes(buffer[:HEADER.size]))
+		if magic != MAGIC or version != VERSION:
+			raise ValueError(f'{path} is not a binary series file of version {VERSION}')
+		index = json.loads(bytes(buffer[HEADER.size:HEADER.size + index_size]))
+		data_start = align(HEADER.size + index_size)
+		for entry in index:
+			load = functools.partial(self.load_series, buffer[data_start:], entry, offset)
+			self.all_series[entry["name"]] = LazySeries(entry["name"], entry["unit"], Better[entry["better"]], entry["count"], load)
+
+	def load_series(self, buffer, entry, offset):
+		count = entry["count"]
+		data = np.frombuffer(buffer, dtype=entry["data"]["dtype"], count=count, offset=entry["data"]["offset"])
+		series = TimeSeries(None, data, entry["unit"], Better[entry["better"]])
+		timestamp = entry["timestamp"]
+		if timestamp is None:
+			return series
+		if "step" in timestamp:
+			series.timestamp = RegularColumn(start=timestamp["start"] + offset, step=timestamp["step"], size=count)
+		else:
+			values = np.frombuffer(buffer, dtype=timestamp["dtype"], count=count, offset=timestamp["offset"])
+			series.timestamp = RegularColumn.from_array(values + offset if offset != 0 else values)
+		return series
+
+	def merge_series(self, all_series):
+		self.all_series.update(all_series)
+
+	def get_all_series(self):
+		return self.all_series
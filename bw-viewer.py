@@ -1,122 +1,55 @@
-import struct
 import matplotlib.pyplot as plt
 from matplotlib.widgets import SpanSelector
 from matplotlib.offsetbox import AnchoredText
 import numpy as np
 import argparse
-
-def get_unit_scale(unit_string):
-	if unit_string == "GB" or unit_string == "GiB":
-		unit_scale = 1024 * 1024 * 1024
-	elif unit_string == "MB" or unit_string == "MiB":
-		unit_scale = 1024 * 1024
-	elif unit_string == "KB" or unit_string == "KiB":
-		unit_scale = 1024
-	else:
-		unit_scale = 1
-	return unit_scale
-	
+from chipvi_importer import ChipviDump
+from chipvi_importer import get_unit_scale
 
 def read_bandwidth_data(file_path):
-	with open(file_path, 'rb') as f:
-		# Read header
-		if not args.no_header:
-			head = f.read(64)
-			unpack_head = struct.unpack('<QQQQQQQQ', head)
-			magic = unpack_head[0]
-			if magic != 0x2B1A3D4C99630F7A:
-				print("Failed to parse file: invalid magic")
-				exit(1)
-			start_time_ns = unpack_head[1]
-			end_time_ns = unpack_head[2]
-			interval_ms = unpack_head[3]
-			count = unpack_head[4]
-			avg = unpack_head[5]
-		else:
-			start_time_ns = args.start_ns
-			end_time_ns = 0
-			interval_ms = args.interval_ms
-			count = 0
-			avg = 0
-
-		print("Information from input file:")
-		print(f"  Start: {start_time_ns} ns")
-		print(f'  End: {end_time_ns} ns')
-		print(f"  Interval: {interval_ms} ms")
-		print(f"  Count: {count}")
-		print(f'  Avg: {avg} MB/s')
-
-		unit_scale = get_unit_scale(args.unit)
-	
-		# Read data
-		read_data = []
-		write_data = []
-		i = 0
-		while True:
-			if i >= count:
-				break
-			# read bandwidth
-			chunk = f.read(4)
-			if len(chunk) < 4:
-				break
-			read = struct.unpack('<I', chunk)[0]
-			read_data.append(read * 32 / unit_scale / (interval_ms / 1000))
-			# write bandwidth
-			chunk = f.read(4)
-			if len(chunk) < 4:
-				break
-			write = struct.unpack('<I', chunk)[0]
-			write_data.append(write * 32 / unit_scale / (interval_ms / 1000))
-			# Bandwidth is in B/s, counter value should multiply by 32 to get bytes
-			i += 1
-	read_data = np.array(read_data)
-	write_data = np.array(write_data)
-
-	assert(len(read_data) == len(write_data))
-	
-	# Convert timestamps axis
-	start = start_time_ns / 1e6
-	stop = start+len(read_data)
-	timestamps_ms = np.arange(start=start, stop=stop, step=interval_ms)
-
-	# Workaround: sometime length of timestamps will not equal to data, maybe bug in np.arrange
-	if len(timestamps_ms) - len(read_data) != 0:
-		timestamps_ms.resize(len(read_data))
-
-	return timestamps_ms, {"Read":read_data, "Write":write_data}
+	try:
+		dump = ChipviDump(file_path, header=not args.no_header, start_ns=args.start_ns, interval_ms=args.interval_ms)
+	except ValueError:
+		print("Failed to parse file: invalid magic")
+		exit(1)
+
+	print("Information from input file:")
+	print(f"  Start: {dump.start_ns} ns")
+	print(f'  End: {dump.end_ns} ns')
+	print(f"  Interval: {dump.interval_ms} ms")
+	print(f"  Count: {dump.count}")
+	print(f'  Avg: {dump.avg} MB/s')
+
+	bandwidth = dump.get_bandwidth(args.unit)
+	timestamps_ms = dump.get_timestamp_column().view() / 1e6
+
+	return timestamps_ms, {"Read": bandwidth["read"], "Write": bandwidth["write"]}
 
 def read_bandwidth_data_perf_x86(file_path):
-	import csv
-	data = {}
-	timestamps_ms = []
-	unit = ""
-	with open(file_path, mode='r', newline='', encoding='utf-8') as file:
-		csv_reader = csv.reader(file)
-		for row in csv_reader:
-			if len(row) == 0 or row[0].startswith("#"):
-				continue
-			timestamp_ms = float(row[0]) * 1000
-			data_size = float(row[1])
-			unit = row[2]
-			name = row[3]
-			interval_ns = float(row[4])
-			bandwidth = data_size / (interval_ns / 1e9)
-			if not name in data:
-				data[name] = []
-			data[name].append(bandwidth)
-			if not timestamp_ms in timestamps_ms:
-				timestamps_ms.append(timestamp_ms)
-
-	unit_scale = get_unit_scale(unit) / get_unit_scale(args.unit)
-		
-	ret = {"Read": np.zeros(len(timestamps_ms)), "Write": np.zeros(len(timestamps_ms))}
-	for key, value in data.items():
-		if "read" in key:
-			ret["Read"] += np.array(value) * unit_scale
-		elif "write" in key:
-			ret["Write"] += np.array(value) * unit_scale
-
-	return np.array(timestamps_ms), ret
+	import pandas as pd
+	# columns of perf stat -x, output: time (s), count, unit, event name and
+	# its run time (ns), the columns after are not used
+	df = pd.read_csv(file_path, header=None, names=range(5), usecols=range(5), comment='#', dtype={2: 'category', 3: 'category'})
+	# index of the timestamp of each row, in order of appearance
+	index, timestamps_ms = pd.factorize(df[0].to_numpy(dtype=np.float64) * 1000)
+	data_size = pd.to_numeric(df[1], errors='coerce').to_numpy(dtype=np.float64)
+	interval_ns = pd.to_numeric(df[4], errors='coerce').to_numpy(dtype=np.float64)
+	# per unit and event name, the last entry is for rows without one
+	units = df[2].cat
+	unit_scale = np.array([get_unit_scale(unit) / get_unit_scale(args.unit) for unit in list(units.categories) + [""]])[units.codes]
+	names = df[3].cat
+	is_read = np.array(["read" in name for name in names.categories] + [False])[names.codes]
+	is_write = np.array(["read" not in name and "write" in name for name in names.categories] + [False])[names.codes]
+	bandwidth = data_size / (interval_ns / 1e9) * unit_scale
+	# counters that are not counted, such as "<not counted>", are skipped
+	valid = ~np.isnan(bandwidth)
+
+	ret = {}
+	for key, rows in (("Read", valid & is_read), ("Write", valid & is_write)):
+		# sum the counters of each timestamp, a timestamp without any is 0
+		ret[key] = np.bincount(index[rows], weights=bandwidth[rows], minlength=len(timestamps_ms))
+
+	return timestamps_ms, ret
 
 
 class BandwidthAnalyzer:
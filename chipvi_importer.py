@@ -0,0 +1,90 @@
+import os
+import struct
+import numpy as np
+from time_series import TimeSeries
+from time_series import Better
+from time_series import RegularColumn
+
+# A chipvi bandwidth dump is a header of 8 uint64: magic, start (ns), end (ns),
+# interval (ms), count of samples, average bandwidth (MB/s) and two reserved,
+# followed by the samples, each a read and a write counter in units of 32 bytes
+MAGIC = 0x2B1A3D4C99630F7A
+HEADER = struct.Struct('<QQQQQQQQ')
+SAMPLE = np.dtype([('read', '<u4'), ('write', '<u4')])
+COUNTER_BYTES = 32
+
+
+def get_unit_scale(unit_string):
+	if unit_string == "GB" or unit_string == "GiB":
+		unit_scale = 1024 * 1024 * 1024
+	elif unit_string == "MB" or unit_string == "MiB":
+		unit_scale = 1024 * 1024
+	elif unit_string == "KB" or unit_string == "KiB":
+		unit_scale = 1024
+	else:
+		unit_scale = 1
+	return unit_scale
+
+
+def is_chipvi(path):
+	with open(path, 'rb') as f:
+		head = f.read(8)
+	return len(head) == 8 and struct.unpack('<Q', head)[0] == MAGIC
+
+
+class ChipviDump:
+	"""
+	Samples of a chipvi bandwidth dump, read at once into a structured array.
+	Without header, the start and interval are given and all samples are read.
+	"""
+	def __init__(self, path, header=True, start_ns=0, interval_ms=1):
+		size = os.path.getsize(path)
+		with open(path, 'rb') as f:
+			if header:
+				magic, start_ns, end_ns, interval_ms, count, avg = HEADER.unpack(f.read(HEADER.size))[:6]
+				if magic != MAGIC:
+					raise ValueError(f'{path} is not a chipvi bandwidth dump: invalid magic')
+				count = min(count, (size - HEADER.size) // SAMPLE.itemsize)
+			else:
+				end_ns = 0
+				avg = 0
+				count = size // SAMPLE.itemsize
+			self.samples = np.fromfile(f, dtype=SAMPLE, count=count)
+		self.start_ns = start_ns
+		self.end_ns = end_ns
+		self.interval_ms = interval_ms
+		self.count = count
+		self.avg = avg
+
+	def get_bandwidth(self, unit="MB"):
+		"""
+		Read and write bandwidth in unit per second.
+		"""
+		scale = get_unit_scale(unit)
+		interval_s = self.interval_ms / 1000
+		return {name: self.samples[name].astype(np.float64) * COUNTER_BYTES / scale / interval_s for name in ("read", "write")}
+
+	def get_timestamp_column(self, offset=0):
+		"""
+		Timestamps of the samples in ns.
+		"""
+		return RegularColumn(start=self.start_ns + offset, step=self.interval_ms * 1000 * 1000, size=len(self.samples))
+
+
+class ChipviImporter:
+	def __init__(self):
+		self.all_series = {}
+
+	def import_from_path(self, path, offset=0):
+		dump = ChipviDump(path)
+		prefix = os.path.basename(path).split('.')[0]
+		for name, data in dump.get_bandwidth("MB").items():
+			series = TimeSeries(None, data, "MB/s", Better.HIGHER)
+			series.timestamp = dump.get_timestamp_column(offset)
+			self.all_series[f'{prefix}.{name}_bw'] = series
+
+	def merge_series(self, all_series):
+		self.all_series.update(all_series)
+
+	def get_all_series(self):
+		return self.all_series
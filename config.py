@@ -1,13 +1,24 @@
+import os
+
 config = {
 	"selector.auto_group": False,
 	"plot.marker": "",
 	"plot.moving_average_window": 0,
 	"plot.hide_original_series": False,
+	# how series are reduced to the plot width: minmax, lttb or none
+	"plot.decimation": "minmax",
 	"bus.beat_size": 0,
+	# keep the data of series as float32 to halve their memory
+	"time_series.float32": False,
+	"cache.dir": os.path.join(os.path.expanduser("~"), ".cache", "perf-analysis"),
+	"cache.max_size": 4 * 1024 * 1024 * 1024,
+	"cache.max_age": 30 * 24 * 3600,
 	"scenario_importer.perf.with_raw_counter": False,
 	"scenario_importer.monitor.with_limit_req": False,
 	"scenario_importer.monitor.with_channel_bw": False,
 	"scenario_importer.print_log": False,
+	# names of the subsystem parsers to run, None for all of them
+	"scenario_importer.parsers": None,
 	"scenario_importer.linux.keep_raw_cpu_utilization": False,
 	"scenario_importer.linux.cpus": {
 		"PNC": "0|1|2|3|4|5|6|7",
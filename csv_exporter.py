@@ -3,7 +3,7 @@ import csv
 def save(path, all_series):
 	with open(path, 'w', newline='') as file:
 		writer = csv.writer(file)
-		writer.writerow(['Name', 'Avg', 'Best', 'Worst', 'Std', 'Count'])
+		writer.writerow(['Name', 'Avg', 'Best', 'Worst', 'Std', 'Count', 'P50', 'P95', 'P99'])
 		for key in sorted(all_series):
 			val = all_series[key]
 			unit = ""
@@ -13,4 +13,18 @@ def save(path, all_series):
 			best = f'{val.calc_best():.2f}{unit}'
 			worst = f'{val.calc_worst():.2f}{unit}'
 			std = f'{val.calc_std():.2f}{unit}'
-			writer.writerow([key, avg, best, worst, std, f'{val.count()}'])
\ No newline at end of file
+			percentiles = [f'{val.calc_percentile(p):.2f}{unit}' for p in (50, 95, 99)]
+			writer.writerow([key, avg, best, worst, std, f'{val.count()}'] + percentiles)
+
+def save_table(path, all_series):
+	"""
+	Save series sharing the same timestamps, one column per series.
+	"""
+	names = sorted(all_series)
+	if len(names) == 0:
+		return
+	with open(path, 'w', newline='') as file:
+		writer = csv.writer(file)
+		writer.writerow(['Timestamp'] + [f'{key} ({all_series[key].get_unit()})' for key in names])
+		columns = [all_series[key].get_data_series().tolist() for key in names]
+		writer.writerows(zip(all_series[names[0]].get_timestamp_series().tolist(), *columns))
@@ -0,0 +1,124 @@
+import numpy as np
+
+
+def coarsen(values: np.ndarray, index: np.ndarray, pick) -> np.ndarray:
+	"""
+	Indexes of the extreme values of each pair of consecutive buckets.
+	"""
+	if len(index) % 2:
+		index = np.append(index, index[-1])
+	first = index[0::2]
+	second = index[1::2]
+	return np.where(pick(values[first], values[second]), first, second)
+
+
+class DecimationPyramid(object):
+	"""
+	Indexes of the minimum and maximum value of every bucket of BASE << level
+	samples, for each level until a single bucket is left. Plotting the minimum
+	and maximum of each bucket keeps the envelope of the series, so the peaks
+	stay visible however far the view is zoomed out.
+	"""
+	# samples in each bucket of the first level
+	BASE = 8
+
+	def __init__(self, x: np.ndarray, y: np.ndarray) -> None:
+		self.x = x
+		self.y = y
+		# only a range of sorted x can be searched for
+		self.is_sorted = len(x) < 2 or bool(np.all(x[1:] >= x[:-1]))
+		self.levels = []
+		if len(y) <= self.BASE:
+			return
+		full = len(y) // self.BASE * self.BASE
+		# the levels take about a quarter of the memory of int64 data
+		dtype = np.int32 if len(y) < 2 ** 31 else np.int64
+		offsets = np.arange(0, full, self.BASE, dtype=dtype)
+		blocks = y[:full].reshape(-1, self.BASE)
+		minimum = offsets + blocks.argmin(axis=1).astype(dtype)
+		maximum = offsets + blocks.argmax(axis=1).astype(dtype)
+		if full < len(y):
+			minimum = np.append(minimum, np.array(full + y[full:].argmin(), dtype=dtype))
+			maximum = np.append(maximum, np.array(full + y[full:].argmax(), dtype=dtype))
+		self.levels.append((minimum, maximum))
+		while len(minimum) > 1:
+			minimum = coarsen(y, minimum, np.less_equal)
+			maximum = coarsen(y, maximum, np.greater_equal)
+			self.levels.append((minimum, maximum))
+
+	def find_range(self, xmin, xmax):
+		"""
+		Index range [begin, end) of the samples with xmin <= x < xmax.
+		"""
+		if not self.is_sorted:
+			return 0, len(self.y)
+		begin, end = np.searchsorted(self.x, (xmin, xmax))
+		return begin, end
+
+	def get(self, begin: int, end: int, points: int):
+		"""
+		At most about points samples covering [begin, end) with the envelope
+		of the samples, plus one bucket on each side to join the line to the
+		samples out of the range.
+		"""
+		if end - begin <= points:
+			begin = max(0, begin - 1)
+			end = min(len(self.y), end + 1)
+			return self.x[begin:end], self.y[begin:end]
+		level = 0
+		while level + 1 < len(self.levels) and (self.BASE << level) * points < 2 * (end - begin):
+			level += 1
+		size = self.BASE << level
+		minimum, maximum = self.levels[level]
+		first = max(0, begin // size - 1)
+		last = min(len(minimum), -(-end // size) + 1)
+		minimum = minimum[first:last]
+		maximum = maximum[first:last]
+		index = np.column_stack((np.minimum(minimum, maximum), np.maximum(minimum, maximum))).ravel()
+		# keep the ends of the series so the line spans all of it
+		if first == 0:
+			index = np.concatenate(([0], index))
+		if last == len(self.levels[level][0]):
+			index = np.concatenate((index, [len(self.y) - 1]))
+		return self.x[index], self.y[index]
+
+
+def lttb(x: np.ndarray, y: np.ndarray, points: int):
+	"""
+	Largest-Triangle-Three-Buckets downsampling to points samples, see
+	Steinarsson, "Downsampling Time Series for Visual Representation".
+	"""
+	if points >= len(y) or points < 3:
+		return x, y
+	x = np.asarray(x, dtype=np.float64)
+	y = np.asarray(y, dtype=np.float64)
+	edges = np.linspace(1, len(y) - 1, points - 1).astype(np.int64)
+	index = np.empty(points, dtype=np.int64)
+	index[0] = 0
+	index[-1] = len(y) - 1
+	for i in range(points - 2):
+		start, stop = edges[i], edges[i + 1]
+		if i + 2 < len(edges):
+			next_x = x[stop:edges[i + 2]].mean()
+			next_y = y[stop:edges[i + 2]].mean()
+		else:
+			next_x = x[-1]
+			next_y = y[-1]
+		prev_x = x[index[i]]
+		prev_y = y[index[i]]
+		area = np.abs((prev_x - next_x) * (y[start:stop] - prev_y) - (prev_x - x[start:stop]) * (next_y - prev_y))
+		index[i + 1] = start + area.argmax()
+	return x[index], y[index]
+
+
+def decimate(pyramid: DecimationPyramid, begin: int, end: int, points: int, method: str):
+	"""
+	Samples to plot for [begin, end) on points pixels, method is one of minmax,
+	lttb and none.
+	"""
+	if method == "none":
+		return pyramid.x, pyramid.y
+	if method == "lttb":
+		x, y = pyramid.get(begin, end, 4 * points)
+		return lttb(x, y, points)
+	return pyramid.get(begin, end, points)
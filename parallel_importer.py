@@ -0,0 +1,52 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from time_series import TimeSeries
+import config
+
+
+def pack_series(all_series):
+	"""
+	Convert series to numpy arrays to send them between processes.
+	"""
+	packed = {}
+	for name, series in all_series.items():
+		if series.is_timestamp_valid():
+			timestamp = series.get_timestamp_series()
+		else:
+			timestamp = None
+		packed[name] = (timestamp, series.get_data_series(), series.get_unit(), series.get_better())
+	return packed
+
+
+def unpack_series(packed):
+	all_series = {}
+	for name, (timestamp, data, unit, better) in packed.items():
+		all_series[name] = TimeSeries(timestamp, data, unit, better)
+	return all_series
+
+
+def import_file(importer_class, path, offset, importer_config):
+	"""
+	Parse one file in a worker process with a fresh importer and return its
+	series as compact numpy arrays.
+	"""
+	config.config.update(importer_config)
+	importer = importer_class()
+	importer.import_from_path(path, offset=offset)
+	return pack_series(importer.all_series)
+
+
+def import_files(importer, files, jobs):
+	"""
+	Import a list of (path, offset) with up to `jobs` worker processes (0 for
+	one per core) and merge the results into importer in the given order.
+	"""
+	if jobs <= 0:
+		jobs = os.cpu_count()
+	with ProcessPoolExecutor(max_workers=min(jobs, len(files))) as executor:
+		futures = []
+		for path, offset in files:
+			print(f'Importing from {path}, offset={offset}')
+			futures.append(executor.submit(import_file, type(importer), path, offset, dict(config.config)))
+		for future in futures:
+			importer.merge_series(unpack_series(future.result()))
@@ -15,6 +15,9 @@ class PPMFImporter:
 		for i, col_name in enumerate(df.columns[1:]):
 			self.all_series[os.path.basename(path).split('.')[0] + '.' + col_name] = TimeSeries(timestamps, tuple(df[col_name]), unit="MB/s", better=Better.HIGHER)
 	
+	def merge_series(self, all_series):
+		self.all_series.update(all_series)
+
 	def get_all_series(self):
 		return self.all_series
 				
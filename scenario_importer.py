@@ -1,583 +1,800 @@
+import io
+import os
 import re
+import bisect
+import functools
+import itertools
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
 from time_series import TimeSeries
 from time_series import Better
+from time_series import combine_series
+from time_series import RegularColumn
 import config
+import parallel_importer
+from scenario_parsers import PARSERS
+from scenario_parsers import RE_MONITOR_START
+
+RE_ZEBU_LOG = re.compile(r'TX>.*RX>')
+RE_TIMESTAMP = re.compile(r'\[(\d+)\](.*)')
+
+class ZebuRecordReader:
+	"""
+	Lazily reassemble ZEBU records from console lines, yielding
+	(raw_lineno, record). A record may be split over several "RX>" lines and is
+	complete once it ends with "\\010". Lines without "RX>" yield an empty record.
+	A record left incomplete at the end of the lines is continued by the next
+	call to read().
+	"""
+	def __init__(self):
+		self.raw_lineno = 0
+		self.line = ""
+		self.new_line = True
+
+	def read(self, f):
+		raw_lineno = self.raw_lineno
+		line = self.line
+		new_line = self.new_line
+		try:
+			for l in f:
+				raw_lineno += 1
+				rx = l.find('RX> ')
+				if rx >= 0:
+					payload = l[rx + 4:].rstrip('\n')
+					# skip error data
+					if payload.strip().startswith("Erroneous data"):
+						continue
+					if new_line:
+						line = payload
+					else:
+						line += payload
+					if line.rstrip().endswith("\\010"):
+						new_line = True
+					else:
+						new_line = False
+						continue
+				else:
+					line = ""
+					new_line = True
+
+				record = line.rstrip()
+				if record.endswith('\\010'):
+					record = record[:-4]
+				record = record.rstrip()
+				if record.endswith('\\013'):
+					record = record[:-4]
+				yield raw_lineno, record.rstrip()
+		finally:
+			self.raw_lineno = raw_lineno
+			self.line = line
+			self.new_line = new_line
+
+class PlainRecordReader:
+	def __init__(self):
+		self.raw_lineno = 0
+
+	def read(self, f):
+		raw_lineno = self.raw_lineno
+		try:
+			for l in f:
+				raw_lineno += 1
+				yield raw_lineno, l.rstrip()
+		finally:
+			self.raw_lineno = raw_lineno
+
+def read_zebu_records(f):
+	return ZebuRecordReader().read(f)
+
+def read_plain_records(f):
+	return PlainRecordReader().read(f)
+
+def is_zebu_log(path):
+	with open(path, "r") as f:
+		for l in f.readlines(10):
+			if RE_ZEBU_LOG.search(l):
+				return True
+	return False
+
+def get_enabled_parsers():
+	"""
+	Parser classes selected by "scenario_importer.parsers", all of them if it
+	is None.
+	"""
+	names = config.config["scenario_importer.parsers"]
+	if names is None:
+		return list(PARSERS.values())
+	for name in names:
+		if name not in PARSERS:
+			raise ValueError(f'Unknown parser {name}, candidates: {", ".join(PARSERS)}')
+	return [cls for name, cls in PARSERS.items() if name in names]
+
+class ScenarioParser:
+	"""
+	Parser of scenario log records, handing each record to the enabled
+	subsystem parsers in scenario_parsers. Everything carried from one record
+	to the next is kept in the attributes listed in STATE, so parsing can
+	resume at any record given the state before it and the number of
+	timestamps of the series so far, see count_series_timestamps.
+	"""
+	STATE = tuple(name for cls in PARSERS.values() for name in cls.STATE)
+	COUNTERS = tuple(name for cls in PARSERS.values() for name in cls.COUNTERS)
+
+	def __init__(self, path, zebu_log, offset=0):
+		self.path = path
+		self.zebu_log = zebu_log
+		self.offset = offset
+		self.all_series = {}
+		# warnings are printed right away unless this is a list to collect them
+		self.warnings = None
+		# set while a parser that is not enabled runs, to drop its data
+		self.discard = False
+		# number of timestamps of the series parsed before the records, 0 for
+		# those without, so that a series continues the same way in all_series
+		self.series_timestamps = {}
+		for cls in PARSERS.values():
+			for name, value in cls.STATE.items():
+				setattr(self, name, value)
+		# parsers that are not enabled still run before an enabled one, so that
+		# they consume the records they would and the enabled ones see the same
+		# records either way. Which records they consume depends on their state
+		# and regexes, so this cannot be decided more cheaply. After the last
+		# enabled parser nothing depends on them, they are left out.
+		enabled = get_enabled_parsers()
+		classes = list(PARSERS.values())
+		last = max((classes.index(cls) for cls in enabled), default=-1)
+		self.subsystems = []
+		for cls in classes[:last + 1]:
+			parse = cls().parse
+			if cls not in enabled:
+				parse = functools.partial(self.parse_discarded, parse)
+			self.subsystems.append((cls.KEYWORDS, parse))
+
+	def get_state(self):
+		return {name: getattr(self, name) for name in self.STATE}
+
+	def set_state(self, state):
+		for name, value in state.items():
+			setattr(self, name, value)
+
+	def add_data(self, key, unit, better, timestamp, value):
+		if self.discard:
+			return
+		series = self.all_series.get(key)
+		if series is None:
+			series = self.all_series[key] = TimeSeries([], [], unit, better)
+		count = self.series_timestamps.get(key)
+		if count == 0:
+			timestamp = None
+		elif count is not None and timestamp is None:
+			# like add_one_data on the whole series, its timestamps are dropped
+			count += series.timestamp.size
+			self.series_timestamps[key] = 0
+			series.timestamp = RegularColumn()
+			raise ValueError(f"Ignoring timestamp of series, original length of timestamp is {count}")
+		series.add_one_data(timestamp, value)
+
+	def parse(self, records):
+		print_log = config.config["scenario_importer.print_log"]
+		for raw_lineno, line in records:
+			timestamp = None
+			try:
+				if self.zebu_log:
+					if print_log:
+						print(line)
+						continue
+
+					search = line.startswith('[') and RE_TIMESTAMP.match(line)
+					if search:
+						timestamp = int(search.group(1)) + self.offset
+						line = search.group(2)
+				self.parse_line(timestamp, line)
+			except Exception as e:
+				if self.warnings is None:
+					print_warning(e, self.path, raw_lineno, timestamp, line)
+				else:
+					self.warnings.append((str(e), raw_lineno, timestamp, line))
+
+	def parse_line(self, timestamp, line):
+		for keywords, parse in self.subsystems:
+			if keywords:
+				for keyword in keywords:
+					if keyword in line:
+						break
+				else:
+					continue
+			if parse(self, timestamp, line):
+				return
+
+	def parse_discarded(self, parse, parser, timestamp, line):
+		self.discard = True
+		try:
+			return parse(parser, timestamp, line)
+		except Exception:
+			# the record is dropped like when the parser is enabled, without
+			# warning about a subsystem that was not asked for
+			return True
+		finally:
+			self.discard = False
+
+def count_series_timestamps(series_timestamps, all_series):
+	"""
+	Add the timestamps of series parsed after those counted in
+	series_timestamps, a series without timestamps is counted as 0 for good.
+	"""
+	for key, series in all_series.items():
+		count = series_timestamps.get(key)
+		if count == 0 or not series.is_timestamp_valid():
+			series_timestamps[key] = 0
+		else:
+			series_timestamps[key] = (count or 0) + len(series.get_raw_timestamp())
+
+def continues_series(series_timestamps, series_started):
+	"""
+	Whether series parsed speculatively, see SpeculativeScenarioParser, are
+	the same as when parsed after the series counted in series_timestamps.
+	"""
+	for key, started in series_started.items():
+		count = series_timestamps.get(key)
+		# a series without timestamps before takes the samples as they are
+		if count == 0:
+			continue
+		# otherwise the first sample without a timestamp after some is dropped
+		# with a warning, and a series with timestamps cannot start without
+		if started is None or count is not None and not started:
+			return False
+	return True
+
+def print_warning(e, path, raw_lineno, timestamp, line):
+	print("Warning:", e)
+	print("  path:", path)
+	print("  line:", raw_lineno)
+	print("  timestamp:", timestamp)
+	print("  content:", line)
+
+class SpeculativeScenarioParser(ScenarioParser):
+	"""
+	Parser for a chunk in the middle of a log whose preceding state is not
+	known yet. It starts from the state of a parser that has been running for a
+	while and records which state was read before being written, so the
+	result can be validated once the real state before the chunk is known.
+	Counters start as a RelativeCount, so the chunk only needs the real count
+	to be known, not to be the same. The series it parses are new, whether
+	each started with a timestamp is recorded to validate them too, or None
+	once a sample without timestamp follows some, which is kept assuming the
+	series had already lost its timestamps, see continues_series.
+	"""
+	def __init__(self, path, zebu_log, offset=0):
+		self.state = {}
+		self.state_read = set()
+		self.state_written = set()
+		self.series_started = {}
+		super().__init__(path, zebu_log, offset)
+		self.mpstat_cnt = 3
+		for name in self.COUNTERS:
+			self.state[name] = RelativeCount(name)
+		self.assumed_state = dict(self.state)
+		self.state_written.clear()
+
+	def get_state(self):
+		# not through the tracked properties, the state is not read by parsing
+		return dict(self.state)
+
+	def add_data(self, key, unit, better, timestamp, value):
+		if not self.discard:
+			series = self.all_series.get(key)
+			if series is None:
+				self.series_started[key] = timestamp is not None
+			elif timestamp is None and series.is_timestamp_valid():
+				self.series_started[key] = None
+				series.timestamp = RegularColumn()
+		super().add_data(key, unit, better, timestamp, value)
+
+class RelativeCount(int):
+	"""
+	Value of a counter relative to its unknown value before a speculatively
+	parsed chunk. Series names formatted with it hold a placeholder, replaced
+	by resolve_counts once the value is known.
+	"""
+	def __new__(cls, name, delta=0):
+		count = super().__new__(cls, delta)
+		count.name = name
+		return count
+
+	def __getnewargs__(self):
+		return (self.name, int(self))
+
+	def __add__(self, other):
+		return RelativeCount(self.name, int(self) + other)
+
+	def __format__(self, spec):
+		return f'<{self.name}{int(self):+d}>'
+
+def uses_count(chunk, name):
+	"""
+	Whether a speculatively parsed chunk used the value of a counter from
+	before it, in a series name or in the value it leaves.
+	"""
+	if name in chunk["written"] and isinstance(chunk["state"][name], RelativeCount):
+		return True
+	return any(f'<{name}' in key for key in chunk["series"])
+
+RE_RELATIVE_COUNT = re.compile(r'<(\w+)([+-]\d+)>')
+
+def resolve_counts(all_series, series_started, state):
+	"""
+	Replace the RelativeCount placeholders in the names of the series of a
+	speculatively parsed chunk with the counts in state, returns the series
+	and whether they started with a timestamp under their real names.
+	"""
+	def resolve(search):
+		return str(state[search.group(1)] + int(search.group(2)))
+	resolved = {}
+	resolved_started = {}
+	for name, series in all_series.items():
+		started = series_started[name]
+		if '<' in name:
+			name = RE_RELATIVE_COUNT.sub(resolve, name)
+		if name in resolved:
+			# counted relatively before the counter was reset in the chunk, the
+			# samples without timestamps are kept like in a single series
+			resolved[name].extend(series)
+			if resolved_started[name] is True and started is not True:
+				resolved_started[name] = None
+		else:
+			resolved[name] = series
+			resolved_started[name] = started
+	return resolved, resolved_started
+
+def tracked_state(name):
+	def get(self):
+		if name not in self.state_written:
+			self.state_read.add(name)
+		return self.state[name]
+
+	def set(self, value):
+		self.state_written.add(name)
+		self.state[name] = value
+	return property(get, set)
+
+for name in ScenarioParser.STATE:
+	setattr(SpeculativeScenarioParser, name, tracked_state(name))
+
+class ByteRange(io.RawIOBase):
+	"""
+	Read-only view of bytes [start, end) of a file, counting the newlines read.
+	"""
+	def __init__(self, f, start, end):
+		self.f = f
+		self.f.seek(start)
+		self.remaining = end - start
+		self.lines = 0
+
+	def readable(self):
+		return True
+
+	def readinto(self, b):
+		n = min(len(b), self.remaining)
+		if n <= 0:
+			return 0
+		view = memoryview(b)[:n]
+		n = self.f.readinto(view)
+		self.lines += view[:n].tobytes().count(b'\n')
+		self.remaining -= n
+		return n
+
+def parse_range(path, start, end, zebu_log, offset, state, series_timestamps, importer_config):
+	"""
+	Parse the records in bytes [start, end) of a log. Without a state, the
+	range is parsed speculatively, see SpeculativeScenarioParser.
+	"""
+	config.config.update(importer_config)
+	if state is None:
+		parser = SpeculativeScenarioParser(path, zebu_log, offset)
+	else:
+		parser = ScenarioParser(path, zebu_log, offset)
+		parser.set_state(state)
+		parser.series_timestamps = dict(series_timestamps)
+	parser.warnings = []
+	with open(path, "rb", buffering=0) as raw:
+		byte_range = ByteRange(raw, start, end)
+		f = io.TextIOWrapper(io.BufferedReader(byte_range, 1024 * 1024))
+		if zebu_log:
+			parser.parse(read_zebu_records(f))
+		else:
+			parser.parse(read_plain_records(f))
+	if state is None:
+		assumed = parser.assumed_state
+		read = parser.state_read
+		written = parser.state_written
+		started = parser.series_started
+	else:
+		assumed = state
+		read = set()
+		written = set(ScenarioParser.STATE)
+		started = None
+	return {
+		"series": parallel_importer.pack_series(parser.all_series),
+		"warnings": parser.warnings,
+		"lines": byte_range.lines,
+		"assumed": assumed,
+		"read": read,
+		"written": written,
+		"started": started,
+		"state": parser.get_state(),
+	}
+
+def find_resync_point(f, pos, zebu_log, window=1024 * 1024, overlap=64 * 1024):
+	"""
+	Find the first record at or after byte pos that starts a bandwidth monitor
+	block, so that a chunk starting there sets up the monitor state itself.
+	Returns None if there is none.
+	"""
+	while True:
+		f.seek(pos)
+		buf = f.read(window)
+		if len(buf) == 0:
+			return None
+		start = 0
+		while True:
+			hit = buf.find(b'Bandwidth**', start)
+			if hit < 0:
+				break
+			start = hit + 1
+			line_start = buf.rfind(b'\n', 0, hit) + 1
+			line_end = buf.find(b'\n', hit)
+			if line_start == 0 or line_end < 0:
+				continue
+			line = buf[line_start:line_end].decode(errors="replace")
+			if not RE_MONITOR_START.search(line):
+				continue
+			if zebu_log and not starts_zebu_record(buf, line_start, line):
+				continue
+			return pos + line_start
+		if len(buf) < window:
+			return None
+		# overlap windows so that lines cut at the end are seen with context
+		pos += window - overlap
+
+def starts_zebu_record(buf, line_start, line):
+	"""
+	Check that the console line at line_start begins a new ZEBU record, i.e. the
+	record before it is complete. Conservatively fails if unsure.
+	"""
+	rx = line.find('RX> ')
+	if rx < 0 or line.find('Bandwidth**') < rx:
+		return False
+	end = line_start - 1
+	while end > 0:
+		start = buf.rfind(b'\n', 0, end) + 1
+		if start == 0:
+			return False
+		prev = buf[start:end].decode(errors="replace")
+		rx = prev.find('RX> ')
+		if rx < 0:
+			return True
+		payload = prev[rx + 4:]
+		if payload.strip().startswith("Erroneous data"):
+			end = start - 1
+			continue
+		return payload.rstrip().endswith("\\010")
+	return False
+
+def find_split_points(path, zebu_log, count):
+	size = os.path.getsize(path)
+	points = [0]
+	with open(path, "rb") as f:
+		for i in range(1, count):
+			point = find_resync_point(f, max(size * i // count, points[-1] + 1), zebu_log)
+			if point is None:
+				break
+			if point > points[-1]:
+				points.append(point)
+	points.append(size)
+	return points
+
+def find_last_line_end(f, start, end, block_size=64 * 1024):
+	"""
+	Return the position just after the last newline in bytes [start, end) of f,
+	or start if there is none.
+	"""
+	pos = end
+	while pos > start:
+		block_start = max(start, pos - block_size)
+		f.seek(block_start)
+		buf = f.read(pos - block_start)
+		newline = buf.rfind(b'\n')
+		if newline >= 0:
+			return block_start + newline + 1
+		pos = block_start
+	return start
+
+class LogFollower:
+	"""
+	Incremental parser of a log that is still being written. Each update() only
+	reads the complete lines appended since the previous one, carrying over the
+	parser state, the timestamps of the series and a ZEBU record split across
+	the two reads.
+	"""
+	def __init__(self, path, offset=0):
+		self.path = path
+		self.offset = offset
+		self.pos = 0
+		self.parser = None
+		self.reader = None
+
+	def reset(self):
+		"""
+		Follow the log from the start again.
+		"""
+		self.pos = 0
+		self.parser = None
+
+	def update(self):
+		"""
+		Parse the new lines and return the series found in them, or None if the
+		log was truncated, in which case the next update reads it from the start.
+		"""
+		with open(self.path, "rb", buffering=0) as raw:
+			size = os.fstat(raw.fileno()).st_size
+			if size < self.pos:
+				self.reset()
+				return None
+			end = find_last_line_end(raw, self.pos, size)
+			if end == self.pos:
+				return {}
+			if self.parser is None:
+				zebu_log = is_zebu_log(self.path)
+				self.parser = ScenarioParser(self.path, zebu_log, self.offset)
+				self.reader = ZebuRecordReader() if zebu_log else PlainRecordReader()
+			count_series_timestamps(self.parser.series_timestamps, self.parser.all_series)
+			self.parser.all_series = {}
+			f = io.TextIOWrapper(io.BufferedReader(ByteRange(raw, self.pos, end), 1024 * 1024))
+			self.parser.parse(self.reader.read(f))
+			self.pos = end
+		return self.parser.all_series
+
+class SeriesNameIndex:
+	"""
+	Ordered series names joined into one string, one per line, so that a
+	pattern is matched against all of them in a single regex scan.
+	"""
+	def __init__(self, names):
+		self.names = list(names)
+		self.text = '\n'.join(self.names)
+		self.starts = list(itertools.accumulate((len(name) + 1 for name in self.names[:-1]), initial=0))
+
+	def add(self, name):
+		if len(self.names) > 0:
+			self.starts.append(len(self.text) + 1)
+			self.text += '\n' + name
+		else:
+			self.starts.append(0)
+			self.text = name
+		self.names.append(name)
+
+	def match(self, pattern):
+		"""
+		Names in which re.search(pattern, name) finds a match, in order.
+		"""
+		regex = re.compile(pattern, re.MULTILINE)
+		matched = []
+		for search in regex.finditer(self.text):
+			if '\n' in search.group():
+				# the pattern can span names, match them one by one instead
+				return [name for name in self.names if re.search(pattern, name)]
+			i = bisect.bisect_right(self.starts, search.start()) - 1
+			if len(matched) == 0 or matched[-1] != i:
+				matched.append(i)
+		return [self.names[i] for i in matched]
 
 class ScenarioImporter:
+	# a single file is split for parallel parsing in chunks of at least this size
+	CHUNK_SIZE_MIN = 16 * 1024 * 1024
+
 	def __init__(self):
 		self.all_series = {}
 		self.post_processed = False
-		pass
+		# derived series of the previous post-processing, name to (inputs, series)
+		self.derived = {}
+		# series changed since the previous post-processing
+		self.changed = set()
+		self.followers = {}
 
-	def import_from_path(self, path: str, offset=0):
-		zebu_log = False
-		with open(path, "r") as f:
-			for l in f.readlines(10):
-				if re.search(r'TX>.*RX>', l):
-					zebu_log = True
-					break
+	def import_from_path(self, path: str, offset=0, jobs=1):
+		zebu_log = is_zebu_log(path)
+		if jobs != 1 and not config.config["scenario_importer.print_log"]:
+			if jobs <= 0:
+				jobs = os.cpu_count()
+			count = min(jobs, os.path.getsize(path) // self.CHUNK_SIZE_MIN)
+			points = find_split_points(path, zebu_log, count)
+			if len(points) > 2:
+				self.import_chunks(path, zebu_log, offset, points, jobs)
+				return
 
+		parser = ScenarioParser(path, zebu_log, offset)
 		with open(path, "r") as f:
-			bpu_model = ""
-			vpu_frame = None
-			vdsp_core = None
-			lineno = 0
-			raw_lineno = 0
-			mpstat_cnt = 0
-			isp_module = ""
-			isp_module_idx = None
-			monitor_timestamp = 0
-			line = ""
-			new_line = True
-			cam_idx = 0
-			monitor_name = ""
-			for l in f.readlines():
-				raw_lineno += 1
-				try:
-					if zebu_log:
-						search = re.search(r'RX> (.*)', l)
-						if search and search.group(1) != None:
-							# skip error data
-							if search.group(1).strip().startswith("Erroneous data"):
-								continue
-							if new_line:
-								line = search.group(1)
-							else:
-								line += search.group(1)
-							if line.rstrip().endswith("\\010"):
-								lineno += 1
-								#if lineno <= 10:
-								#	print(line)
-								new_line = True
-							else:
-								new_line = False
-								continue
-						else:
-							line = ""
-							new_line = True
-							ValueError(f"Failed to parse line: {line}")
-
-						line = line.rstrip()
-						if line.endswith('\\010'):
-							line = line[:-4]
-						line = line.rstrip()
-						if line.endswith('\\013'):
-							line = line[:-4]
-						line = line.rstrip()
-
-						if config.config["scenario_importer.print_log"]:
-							print(line)
-							continue
-
-						search = re.search(r'^(\[(\d+)\])?(.*)', line)
-						if search:
-							if search.group(2) != None:
-								timestamp = int(search.group(2))
-							else:
-								timestamp = None
-							line = search.group(3)
-						else:
-							ValueError(f"Failed to parse line: {line}")
-					else:
-						line = l.rstrip()
-						timestamp = None
+			if zebu_log:
+				parser.parse(read_zebu_records(f))
+			else:
+				parser.parse(read_plain_records(f))
+		self.merge_series(parser.all_series)
 
-					# vpu
-					search = re.search(r'Start testing frame (\d+)', line)
-					if search:
-						vpu_frame = int(search.group(1))
-						continue
-					search = re.search(r'Core id:(\d+).*cycles this frame , (\d+) cycle', line)
-					if search and vpu_frame != None and vpu_frame == 1:
-						vpu_core = int(search.group(1))
-						if vpu_core == 0:
-							vpu_name = "0.jdec"
-						elif vpu_core == 1:
-							vpu_name = "1.jenc"
-						elif vpu_core == 2:
-							vpu_name = "2.vdec"
-						elif vpu_core == 3:
-							vpu_name = "3.venc0"
-						elif vpu_core == 4:
-							vpu_name = "4.venc1"
-						else:
-							vpu_name = f'{vpu_core}'
-						vpu_cycle = int(search.group(2))
-						key = f'vpu.{vpu_name}.cycle'
-						if key not in self.all_series:
-							self.all_series[key] = TimeSeries([], [], 'cycle', Better.LOWER)
-						self.all_series[key].add_one_data(timestamp, vpu_cycle)
-						continue
-					# bpu
-					search = re.search(r'Test: .*bpu.*started', line)
-					if search:
-						bpu_num = 0
-					search = re.search(r'BPU model\[(.*)\] sum: read_bw\[(\d+)\] MB/s; write_bw\[(\d+)\] MB/s', line)
-					if search:
-						model = search.group(1)
-						read_bw = int(search.group(2))
-						write_bw = int(search.group(3))
-						bw = read_bw + write_bw
-						key = f'bpu.{bpu_num}.{model}.bw'
-						if key not in self.all_series:
-							self.all_series[key] = TimeSeries([], [], 'MB/s', Better.HIGHER)
-						self.all_series[key].add_one_data(timestamp, bw)
-						bpu_num += 1
-						continue
-					search = re.search(r'BPU model\[(.*)\].*fps\[(\d+)\]', line)
-					if search:
-						bpu_model = search.group(1)
-						bpu_model_fps = int(search.group(2))
-						key = f'bpu.{bpu_num}.{bpu_model}.fps'
-						if key not in self.all_series:
-							self.all_series[key] = TimeSeries([], [], 'fps', Better.HIGHER)
-						self.all_series[key].add_one_data(timestamp, bpu_model_fps)
-						continue
-					if bpu_model != "":
-						search = re.search(r'read_bw\[(\d+)\].*write_bw\[(\d+)\]', line)
-						if search:
-							key = f'bpu.{bpu_num}.{bpu_model}.read_bw'
-							bw = int(search.group(1))
-							if key not in self.all_series:
-								self.all_series[key] = TimeSeries([], [], 'MB/s', Better.HIGHER)
-							self.all_series[key].add_one_data(timestamp, bw)
-
-							key = f'bpu.{bpu_num}.{bpu_model}.write_bw'
-							bw = int(search.group(2))
-							if key not in self.all_series:
-								self.all_series[key] = TimeSeries([], [], 'MB/s', Better.HIGHER)
-							self.all_series[key].add_one_data(timestamp, bw)
-							bpu_num += 1
-							continue
-					# vdsp
-					search = re.search(r'VDSP Chip_Vi test function, Processor ID: \[(\d+)\]', line)
-					if search:
-						vdsp_core = int(search.group(1))
-						continue
-					if vdsp_core != None:
-						search = re.search(r'DDR R/W Bandwidth: (.*) MB/s', line)
-						if search:
-							key = f'vdsp.{vdsp_core}.copy_rw'
-							bw = float(search.group(1)) * 2
-							if key not in self.all_series:
-								self.all_series[key] = TimeSeries([], [], 'MB/s', Better.HIGHER)
-							self.all_series[key].add_one_data(timestamp, bw)
-							continue
-					# PNC
-					search = re.search(r'(all|\d+)\s+(\d+.\d+)\s+(\d+\.\d+)\s+(\d+\.\d+)\s+(\d+\.\d+)\s+(\d+\.\d+)\s+(\d+\.\d+)\s+(\d+\.\d+)\s+(\d+\.\d+)\s+(\d+\.\d+)', line)
-					if search:
-						cpu = search.group(1)
-						if cpu == 'all':
-							mpstat_cnt += 1
-						# skip the first 2 seconds
-						if mpstat_cnt <= 2:
-							continue
-						busy = 100 - float(search.group(10))
-						key = f'a720.linux.{cpu}.cpu_utilization'
-						if key not in self.all_series:
-							self.all_series[key] = TimeSeries([], [], '%', Better.LOWER)
-						self.all_series[key].add_one_data(timestamp, busy)
-						continue
+	def import_chunks(self, path, zebu_log, offset, points, jobs):
+		"""
+		Parse the chunks between split points concurrently. Each chunk after the
+		first one is parsed speculatively and parsed again from the real state if
+		the state it assumed turns out to be wrong, or its series do not continue
+		those before it with or without timestamps.
+		"""
+		importer_config = dict(config.config)
+		state = ScenarioParser(path, zebu_log, offset).get_state()
+		series_timestamps = {}
+		lineno = 0
+		with ProcessPoolExecutor(max_workers=min(jobs, len(points) - 1)) as executor:
+			futures = []
+			for i in range(len(points) - 1):
+				futures.append(executor.submit(parse_range, path, points[i], points[i + 1], zebu_log, offset, state if i == 0 else None, {}, importer_config))
+			for i, future in enumerate(futures):
+				chunk = future.result()
+				all_series = parallel_importer.unpack_series(chunk["series"])
+				if chunk["started"] is not None:
+					# a counter used relatively only needs to have been set
+					valid = all(state[name] is not None or not uses_count(chunk, name) if name in ScenarioParser.COUNTERS else chunk["assumed"][name] == state[name] for name in chunk["read"])
+					if valid:
+						all_series, series_started = resolve_counts(all_series, chunk["started"], state)
+						valid = continues_series(series_timestamps, series_started)
+					if not valid:
+						chunk = parse_range(path, points[i], points[i + 1], zebu_log, offset, state, series_timestamps, importer_config)
+						all_series = parallel_importer.unpack_series(chunk["series"])
+				for message, raw_lineno, timestamp, line in chunk["warnings"]:
+					print_warning(message, path, lineno + raw_lineno, timestamp, line)
+				lineno += chunk["lines"]
+				state = dict(state)
+				for name in chunk["written"]:
+					value = chunk["state"][name]
+					if isinstance(value, RelativeCount):
+						value = state[name] + int(value)
+					state[name] = value
+				count_series_timestamps(series_timestamps, all_series)
+				self.merge_series(all_series)
 
-					search = re.search(r',(instructions|cycles|cpu-clock|r60|r61|cache-misses),\d+', line)
-					if search:
-						perf_output = line.strip().split(',')
-						perf_timestamp = float(perf_output[0]) * 1e9
-						perf_counter = float(perf_output[1])
-						perf_name = perf_output[3]
-						metric = float(perf_output[6])
-						metric_unit = perf_output[7]
-						if config.config['scenario_importer.perf.with_raw_counter']:
-							key = f'a720.PNC.perf.{perf_name}'
-							if key not in self.all_series:
-								self.all_series[key] = TimeSeries([], [], 'count', Better.HIGHER)
-							self.all_series[key].add_one_data(int(perf_timestamp), perf_counter)
-						metric_key = ""
-						if metric_unit == 'K/sec':
-							metric /= 1024
-						elif metric_unit == 'G/sec':
-							metric *= 1024
-						elif metric_unit == '/sec':
-							metric /= 1024 * 1024
-						elif metric_unit == 'M/sec':
-							pass
-						elif metric_unit == 'insn per cycle':
-							metric_key = 'a720.PNC.perf.ipc'
-							metric_unit = 'ipc'
-						elif metric_unit == "CPUs utilized":
-							metric_key = 'a720.PNC.perf.cpus'
-							metric_unit = 'count'
-
-						beat_size = config.config['bus.beat_size']
-						if perf_name == 'r60' or perf_name == 'r61':
-							if perf_name == 'r60':
-								metric_key = 'a720.PNC.perf.bus_access_rd'
-							else:
-								metric_key = 'a720.PNC.perf.bus_access_wr'
-							if beat_size > 0:
-								metric *= beat_size
-								metric_unit = 'MB/s'
-							else:
-								metric_unit = 'Mbeat/s'
-						elif perf_name == 'cache-misses':
-							metric_key = 'a720.PNC.perf.cache_miss'
-							metric_unit = '%'
-						if metric_key != "":
-							if metric_key not in self.all_series:
-								self.all_series[metric_key] = TimeSeries([], [], metric_unit, Better.HIGHER)
-							self.all_series[metric_key].add_one_data(int(perf_timestamp), metric)
-						continue
-					# cam
-					search = re.search('(?:\[0m)?([a-z]+)(\d+) pipe info:', line)
-					if search:
-						isp_module = search.group(1)
-						isp_module_idx = search.group(2)
-						continue
-					if isp_module != "":
-						search = re.search(r' fps:(\d+\.\d+)', line)
-						if search:
-							fps = float(search.group(1))
-							key = f'cam.{isp_module}.{isp_module_idx}.fps'
-							if key not in self.all_series:
-								self.all_series[key] = TimeSeries([], [], 'fps', Better.HIGHER)
-							self.all_series[key].add_one_data(timestamp, fps)
-							isp_module = ""
-							isp_module_idx = None
-							continue
-						# Disable hw_process_time because the data is not accurate
-						#search = re.search(r'max hw proc tm:(\d+\.\d+)ms', line)
-						#if search:
-						#	time = float(search.group(1))
-						#	key = f'cam.{isp_module}.{isp_module_idx}.hw_process_time'
-						#	if key not in self.all_series:
-						#		self.all_series[key] = TimeSeries([], [], 'ms', Better.LOWER)
-						#	self.all_series[key].add_one_data(timestamp, time)
-						#	continue
-					search = re.search(r' \[(\w+)\]\[(\w+)\] recv frm\(overflow/total\): \((\d+)/(\d+)\)', line)
-					if search:
-						mod0 = search.group(1)
-						mod1 = search.group(2)
-						key = f"cam.{mod0}.{mod1}.overflow"
-						overflow = float(search.group(3))
-						total = float(search.group(4))
-						if key not in self.all_series:
-							self.all_series[key] = TimeSeries([], [], '%', Better.HIGHER)
-						self.all_series[key].add_one_data(timestamp, overflow/total)
-						continue
-					# dpu
-					search = re.search(r'Display get (.*) frame done,fps = (\d+\.\d+), bw = (\d+)', line)
-					if search:
-						if search.group(1) == 'dpu0':
-							prefix = 'dpu.0.'
-						elif search.group(1) == 'dpu1':
-							prefix = 'dpu.1.'
-						elif search.group(1) == 'wb':
-							prefix = 'dpu.'
-						elif search.group(1) == 'dpu0 compose0' or search.group(1) == 'dpu0 composer0':
-							prefix = 'dpu.0.composer.0.'
-						elif search.group(1) == 'dpu0 composer1':
-							prefix = 'dpu.0.composer.1.'
-						elif search.group(1) == 'dpu1 composer0':
-							prefix = 'dpu.1.composer.0.'
-						elif search.group(1) == 'dpu1 composer1':
-							prefix = 'dpu.1.composer.1.'
-						else:
-							raise Exception(f'Unknown display module {search.group(1)}')
-						key = prefix + 'fps'
-						fps = float(search.group(2))
-						if key not in self.all_series:
-							self.all_series[key] = TimeSeries([], [], 'fps', Better.HIGHER)
-						self.all_series[key].add_one_data(timestamp, fps)
-
-						key = prefix + 'bw'
-						bw = int(search.group(3)) / 1024 / 1024
-						if key not in self.all_series:
-							self.all_series[key] = TimeSeries([], [], 'MB/s', Better.HIGHER)
-						self.all_series[key].add_one_data(timestamp, bw)
-						continue
-					search = re.search(r'Display dpu(\d+) composer(\d+) underflow probability (\d+)%', line)
-					if search:
-						key = f'dpu.{search.group(1)}.composer.{search.group(2)}.underflow'
-						val = int(search.group(3))
-						if key not in self.all_series:
-							self.all_series[key] = TimeSeries([], [], '%', Better.LOWER)
-						self.all_series[key].add_one_data(timestamp, val)
-						continue
-					# cpu memcpy
-					search = re.search(r'Core(\d+):.*cpu memcpy test bandwidth: (\d+) MB/s', line)
-					if search:
-						core_id = int(search.group(1))
-						bw = int(search.group(2))
-						key = f'a720.{core_id}.memcpy'
-						if key not in self.all_series:
-							self.all_series[key] = TimeSeries([], [], 'MB/s', Better.HIGHER)
-						self.all_series[key].add_one_data(timestamp, bw)
-						continue
-					# gpua
-					search = re.search(r'handle_output_ri.*diff:(\w+)', line)
-					if search:
-						#fps = 1e9 / int("0x" + search.group(1), 16)
-						fps = 1e9 / int(search.group(1))
-						key = "gpua.fps"
-						if key not in self.all_series:
-							self.all_series[key] = TimeSeries([], [], "fps", Better.HIGHER)
-						self.all_series[key].add_one_data(timestamp, fps)
-						continue
-					# clpeak
-					search = re.search(r'clpeak float\s+:\s+(\d+\.\d+)', line)
-					if search:
-						bw = float(search.group(1)) * 1024
-						key = f'gpua.clpeak.float.bw'
-						if key not in self.all_series:
-							self.all_series[key] = TimeSeries([], [], "MB/s", Better.HIGHER)
-						self.all_series[key].add_one_data(timestamp, bw)
-					# bandwidth monitor
-					search = re.search(r'\*\*(Average|Full) Bandwidth\*\*', line)
-					if search:
-						monitor_timestamp = timestamp
-						cam_idx = 0
-						continue
-					if monitor_timestamp > 0:
-						# stripe leading color codes
-						search = re.search(r'(?:\[36m.*\[0m)(.*)', line)
-						if search:
-							striped_line = search.group(1)
-						else:
-							striped_line = line
-						# the next line of bandwidth monitor is latency
-						if monitor_name != "":
-							if striped_line.startswith('WB '):
-								metric = "write_bw"
-								striped_line = striped_line[3:]
-								better = Better.HIGHER
-								unit = "MB/s"
-								end = False
-							elif striped_line.startswith('RL '):
-								metric = "read_latency"
-								striped_line = striped_line[3:]
-								better = Better.LOWER
-								unit = "ns"
-								end = False
-							elif striped_line.startswith('WL '):
-								metric = "write_latency"
-								striped_line = striped_line[3:]
-								better = Better.LOWER
-								unit = "ns"
-								end = True
-							else:
-								metric = "latency"
-								better = Better.LOWER
-								unit = "ns"
-								end = True
-							search = re.search(r'^((\d+ +)+)', striped_line+" ")
-							if search:
-								for i, v in enumerate(search.group(1).strip().split()):
-									key = f'{monitor_name}.monitor.{i}.{metric}'
-									if key not in self.all_series:
-										self.all_series[key] = TimeSeries([], [], unit, better)
-									self.all_series[key].add_one_data(monitor_timestamp, int(v))
-								if end:
-									monitor_name = ""
-								continue
-							elif end:
-								monitor_name = ""
-						# now check the orginal bandwidth monitor line
-						search = re.search(r'^(.+): (\d+) ([KMG]+B/s)', striped_line)
-						if search:
-							name = search.group(1).lower()
-							if name.endswith(' read'):
-								rw = 'read'
-								name = name[:-5]
-							elif name.endswith(' write'):
-								rw = 'write'
-								name = name[:-6]
-							elif name.endswith(' total'):
-								rw = 'total'
-								name = name[:-6]
-							else:
-								rw = 'total'
-							
-							# workaround for duplicate cam
-							if name == 'cam':
-								cam_idx += 1
-								if cam_idx % 2 == 0:
-									continue
-							if name == 'cpu':
-								name = 'a720.PNC'
-							elif name.startswith('cpu '):
-								name = name.replace('cpu ', 'a720.')
-
-							name = name.replace(' ', '_')
-							key = f'{name}.monitor.{rw}_bw'
-							bw = int(search.group(2))
-							unit = search.group(3)
-							if key not in self.all_series:
-								self.all_series[key] = TimeSeries([], [], unit, Better.HIGHER)
-							self.all_series[key].add_one_data(monitor_timestamp, bw)
-							continue
-						else:
-							search = re.search(r'^(.+):(( +\d+)+)', striped_line)
-							if search:
-								monitor_name = search.group(1).lower()
-								if monitor_name.endswith(' rb'):
-									monitor_name = monitor_name[:-3]
-									rw = 'read'
-								else:
-									rw = 'total'
-								for i, v in enumerate(search.group(2).strip().split()):
-									key = f'{monitor_name}.monitor.{i}.{rw}_bw'
-									if key not in self.all_series:
-										self.all_series[key] = TimeSeries([], [], "MB/s", Better.HIGHER)
-									self.all_series[key].add_one_data(monitor_timestamp, int(v))
-								continue
-						# for ddr limit req
-						if config.config['scenario_importer.monitor.with_limit_req']:
-							search = re.search(r'(Read|Write): ((\d| )+)', striped_line)
-							if search:
-								rw = search.group(1).lower()
-								watermark = search.group(2).split()
-								for i, v in enumerate(watermark):
-									key = f'ddr.{i}.{rw}.monitor.limit_req'
-									wm = int(v)
-									if key not in self.all_series:
-										self.all_series[key] = TimeSeries([], [], 'count', Better.HIGHER)
-									self.all_series[key].add_one_data(monitor_timestamp, wm)
-								continue
-						if config.config['scenario_importer.monitor.with_channel_bw']:
-							search = re.search(r'(R Channel|W Channel): ((\d| )+)', striped_line)
-							if search:
-								rw = search.group(1).lower()
-								if rw == 'r channel':
-									rw = 'read'
-								elif rw == 'w channel':
-									rw = 'write'
-								bandwidth = search.group(2).split()
-								for i, v in enumerate(bandwidth):
-									key = f'ddr.{i}.monitor.{rw}_bw'
-									bw = int(v)
-									if key not in self.all_series:
-										self.all_series[key] = TimeSeries([], [], 'MB/s', Better.HIGHER)
-									self.all_series[key].add_one_data(monitor_timestamp, bw)
-								continue
-							
-				except Exception as e:
-					print("Warning:", e)
-					print("  path:", path)
-					print("  line:", raw_lineno)
-					print("  timestamp:", timestamp)
-					print("  content:", line)
-
-	def pad_and_add(self, a, b):
-		max_length = max(len(a), len(b))
-		new_a = np.zeros(max_length, dtype=a.dtype)
-		new_b = np.zeros(max_length, dtype=b.dtype)
-		new_a[:len(a)] = a
-		new_b[:len(b)] = b
-		return new_a + new_b
+	def follow_from_path(self, path: str, offset=0):
+		"""
+		Import what has been appended to path since the previous call, the first
+		call imports the file as it is. Returns whether anything was added.
+		"""
+		follower = self.followers.get(path)
+		if follower is None:
+			follower = self.followers[path] = LogFollower(path, offset)
+		all_series = follower.update()
+		if all_series is None:
+			# the data of the log is interleaved with that of the other logs in
+			# the series, read them all again instead
+			print(f'Warning: {path} was truncated, following the logs from the start again')
+			self.all_series = {}
+			self.post_processed = False
+			self.derived = {}
+			for follower in self.followers.values():
+				follower.reset()
+				self.merge_series(follower.update())
+			return True
+		self.merge_series(all_series)
+		return len(all_series) > 0
+
+	def merge_series(self, all_series):
+		if all_series:
+			self.post_processed = False
+		self.changed.update(all_series)
+		for key, series in all_series.items():
+			if key in self.all_series:
+				self.all_series[key].extend(series)
+			else:
+				self.all_series[key] = series
 
 	def add_series(self, series_0, series_1):
-		data = self.pad_and_add(series_0.get_data_series(), series_1.get_data_series())
-		if series_0.is_timestamp_valid():
-			timestamp = series_0.get_timestamp_series()
-		else:
-			timestamp = None
-		unit = series_0.get_unit()
-		better = series_0.get_better()
-		return TimeSeries(timestamp, data, unit, better)
+		return combine_series([series_0, series_1])
 
 	def minus_series(self, series_0, series_1):
-		data = self.pad_and_add(series_0.get_data_series(), series_1.get_data_series() * (-1))
-		if series_0.is_timestamp_valid():
-			timestamp = series_0.get_timestamp_series()
+		negative = TimeSeries(series_1.get_raw_timestamp(), series_1.get_data_series() * (-1), series_1.get_unit(), series_1.get_better())
+		return combine_series([series_0, negative])
+
+	def set_processed(self, name, series):
+		if name not in self.processed_series and self.name_index is not None:
+			self.name_index.add(name)
+		self.processed_series[name] = series
+
+	def derive(self, name, keys, combine):
+		"""
+		Set the processed series name to combine() of the processed series keys
+		and return it. The series of the previous post-processing is reused if
+		it was derived from the same series and none of them changed since.
+		"""
+		cached = self.derived.get(name)
+		if cached is not None and cached[0] == keys and self.changed.isdisjoint(keys):
+			series = cached[1]
 		else:
-			timestamp = None
-		unit = series_0.get_unit()
-		better = series_0.get_better()
-		return TimeSeries(timestamp, data, unit, better)
-
-	def do_sum_series(self, pattern, new_name):
-		count = 0
-		if new_name not in self.all_series:
-			new_series = []
-			new_timestamp = []
-			new_unit = ""
-			for key in self.all_series:
-				if re.search(pattern, key):
-					print(f"{new_name} add by {key}")
-					if len(new_series) == 0:
-						new_series = self.all_series[key].get_data_series()
-						if self.all_series[key].is_timestamp_valid():
-							new_timestamp = self.all_series[key].get_timestamp_series()
-						else:
-							new_timestamp = None
-						new_unit = self.all_series[key].get_unit()
-						new_better = self.all_series[key].get_better()
-						count = 1
-					else:
-						new_series = self.pad_and_add(new_series, self.all_series[key].get_data_series())
-						count += 1
-			if len(new_series) > 0:
-				timestamp = new_timestamp.tolist() if new_timestamp is not None else None
-				data = new_series.tolist() if new_series is not None else None
-				self.all_series[new_name] = TimeSeries(timestamp, data, new_unit, new_better)
-			return count
+			series = combine()
+			self.derived[name] = (keys, series)
+			self.changed.add(name)
+		if series is not None:
+			self.set_processed(name, series)
+		return series
+
+	def pop_processed(self, name):
+		self.name_index = None
+		return self.processed_series.pop(name)
+
+	def match_processed(self, pattern):
+		if self.name_index is None:
+			self.name_index = SeriesNameIndex(self.processed_series)
+		return self.name_index.match(pattern)
+
+	def do_sum_series(self, pattern, new_name, average=False):
+		if new_name in self.processed_series:
+			return 0
+		keys = self.match_processed(pattern)
+		for key in keys:
+			print(f"{new_name} add by {key}")
+		# an empty series is replaced by the next one as the first addend
+		while len(keys) > 0 and self.processed_series[keys[0]].count() == 0:
+			keys = keys[1:]
+		if len(keys) == 0:
+			return 0
+		self.derive(new_name, tuple(keys), lambda: combine_series([self.processed_series[key] for key in keys], average))
+		return len(keys)
 
 	def sum_series(self, pattern, new_name):
 		self.do_sum_series(pattern, new_name)
-	
+
 	def avg_series(self, pattern, new_name):
-		count = self.do_sum_series(pattern, new_name)
-		if count <= 1:
-			return
-		unit = self.all_series[new_name].get_unit()
-		data = self.all_series[new_name].get_data_series() / count
-		better = self.all_series[new_name].get_better()
-		if self.all_series[new_name].is_timestamp_valid():
-			timestamp = self.all_series[new_name].get_timestamp_series()
-		else:
-			timestamp = None
-		self.all_series[new_name] = TimeSeries(timestamp, data, unit, better)
+		self.do_sum_series(pattern, new_name, average=True)
+
+	def multiply_cpus(self, name):
+		ipc = self.processed_series[name].get_data_series()
+		ipc_ts = self.processed_series[name].get_timestamp_series()
+		cpus = self.processed_series['a720.PNC.perf.cpus'].get_data_series()
+		cpus_ts = self.processed_series['a720.PNC.perf.cpus'].get_timestamp_series()
+		ipc_unit = self.processed_series[name].get_unit()
+		if np.array_equal(cpus_ts, ipc_ts):
+			if not self.processed_series[name].is_timestamp_valid():
+				ipc_ts = None
+			return TimeSeries(ipc_ts, ipc * cpus, ipc_unit, Better.HIGHER)
+		print(f'{name}: perf cpus series has different timestamps, {len(cpus_ts)}, {len(ipc_ts)}')
+		return None
 
 	def sum_perf_cpus(self, name):
-		if name in self.all_series and 'a720.PNC.perf.cpus':
-			ipc = self.all_series[name].get_data_series()
-			ipc_ts = self.all_series[name].get_timestamp_series()
-			cpus = self.all_series['a720.PNC.perf.cpus'].get_data_series()
-			cpus_ts = self.all_series['a720.PNC.perf.cpus'].get_timestamp_series()
-			ipc_unit = self.all_series[name].get_unit()
-			if np.array_equal(cpus_ts, ipc_ts):
-				if not self.all_series[name].is_timestamp_valid():
-					ipc_ts = None
-				new_ipc = ipc * cpus
-				self.all_series[name+'_total'] = TimeSeries(ipc_ts, new_ipc, ipc_unit, Better.HIGHER)
-				self.all_series.pop(name)
+		if name in self.processed_series and 'a720.PNC.perf.cpus':
+			if self.derive(name+'_total', (name, 'a720.PNC.perf.cpus'), lambda: self.multiply_cpus(name)) is not None:
+				self.pop_processed(name)
 				return True
-			else:
-				print(f'{name}: perf cpus series has different timestamps, {len(cpus_ts)}, {len(ipc_ts)}')
 			return False
 
 	def calc_total_bw(self):
-		total_bw = {}
-		for key in self.all_series:
-			total_key = None
+		addends = {}
+		for key in self.processed_series:
 			if key.endswith('.monitor.read_bw'):
 				total_key = key.replace('read_bw', 'total_bw(r+w)')
 			elif key.endswith('.monitor.write_bw'):
 				total_key = key.replace('write_bw', 'total_bw(r+w)')
-			if total_key is None:
-				continue
-			if total_key in total_bw:
-				total_bw[total_key] = self.add_series(total_bw[total_key], self.all_series[key])
 			else:
-				total_bw[total_key] = self.all_series[key]
+				continue
+			addends.setdefault(total_key, []).append(key)
 
-		for key in total_bw:
-			if key not in self.all_series:
-				self.all_series[key] = total_bw[key]
+		for key, names in addends.items():
+			if key not in self.processed_series:
+				series = [self.processed_series[name] for name in names]
+				self.derive(key, tuple(names), lambda: series[0] if len(series) == 1 else combine_series(series))
 
 	def get_all_series(self):
+		"""
+		Return the parsed series with the derived ones added. The parsed series
+		are left untouched so more data can still be appended to them, and the
+		derived series none of whose inputs got more data are kept from the
+		previous call.
+		"""
 		if not self.post_processed:
+			self.processed_series = dict(self.all_series)
+			self.name_index = None
 			self.calc_total_bw()
 			#self.sum_series(r'^(?!ddr(\.\d+)*).+\.monitor(\.\d+)?\.total_bw$', 'ddr.monitor.sum_total_bw')
 			#self.sum_series(r'^(?!ddr(\.\d+)*).+\.monitor\.total_bw\(r\+w\)$', 'ddr.monitor.sum_total_bw(r+w)')
@@ -591,29 +808,31 @@ class ScenarioImporter:
 			for name in ['cam', 'bpu', 'dpu', 'gpua', 'vpu']:
 				self.sum_series(f'{name}\.monitor\.\d+\.read_bw', f'{name}.monitor.sum_read_bw')
 				self.sum_series(f'{name}\.monitor\.\d+\.write_bw', f'{name}.monitor.sum_write_bw')
-				if f'{name}.monitor.sum_read_bw' in self.all_series and f'{name}.monitor.sum_write_bw' in self.all_series:
-					self.all_series[f'{name}.monitor.sum_total_bw'] = self.add_series(self.all_series[f'{name}.monitor.sum_read_bw'], self.all_series[f'{name}.monitor.sum_write_bw'])
-			if self.all_series.get('ddr.monitor.total_bw(r+w)') is None and self.all_series.get('ddr_adas.monitor.total_bw(r+w)') is not None:
-				self.all_series['ddr.monitor.total_bw(r+w)'] = self.add_series(self.all_series['ddr_adas.monitor.total_bw(r+w)'], self.all_series['ddr_cabit.monitor.total_bw(r+w)'])
-				self.all_series['ddr.monitor.read_bw'] = self.add_series(self.all_series['ddr_adas.monitor.read_bw'], self.all_series['ddr_cabit.monitor.read_bw'])
-				self.all_series['ddr.monitor.write_bw'] = self.add_series(self.all_series['ddr_adas.monitor.write_bw'], self.all_series['ddr_cabit.monitor.write_bw'])
+				if f'{name}.monitor.sum_read_bw' in self.processed_series and f'{name}.monitor.sum_write_bw' in self.processed_series:
+					keys = (f'{name}.monitor.sum_read_bw', f'{name}.monitor.sum_write_bw')
+					self.derive(f'{name}.monitor.sum_total_bw', keys, lambda: self.add_series(*(self.processed_series[key] for key in keys)))
+			if self.processed_series.get('ddr.monitor.total_bw(r+w)') is None and self.processed_series.get('ddr_adas.monitor.total_bw(r+w)') is not None:
+				for suffix in ['total_bw(r+w)', 'read_bw', 'write_bw']:
+					keys = (f'ddr_adas.monitor.{suffix}', f'ddr_cabit.monitor.{suffix}')
+					self.derive(f'ddr.monitor.{suffix}', keys, lambda: self.add_series(*(self.processed_series[key] for key in keys)))
 			self.sum_series(r'ddr\.\d*[1,3,5,7,9]\.monitor\.total_bw', 'ddr.adas.monitor.sum_total_bw')
 			self.sum_series(r'ddr\.\d*[2,4,6,8,0]\.monitor\.total_bw', 'ddr.ivi.monitor.sum_total_bw')
 			for name in config.config["scenario_importer.linux.cpus"]:
 				cpus = config.config["scenario_importer.linux.cpus"][name]
 				self.avg_series(f'a720\.linux\.({cpus})\.cpu_utilization', f'a720.{name}.cpu_utilization')
 			if not config.config["scenario_importer.linux.keep_raw_cpu_utilization"]:
-				for key in list(self.all_series.keys()):
+				for key in list(self.processed_series.keys()):
 					if key.startswith('a720.linux.'):
-						self.all_series.pop(key)
+						self.pop_processed(key)
 			#self.sum_series('a720.*memcpy', 'a720.sum.memcpy')
 			self.sum_perf_cpus('a720.PNC.perf.ipc')
 			self.sum_perf_cpus('a720.PNC.perf.bus_access_rd')
 			self.sum_perf_cpus('a720.PNC.perf.bus_access_wr')
-			if "a720.PNC.perf.cpus" in self.all_series:
-				self.all_series.pop('a720.PNC.perf.cpus')
-			if 'a720.PNC.cpu_utilization' in self.all_series:
+			if "a720.PNC.perf.cpus" in self.processed_series:
+				self.pop_processed('a720.PNC.perf.cpus')
+			if 'a720.PNC.cpu_utilization' in self.processed_series:
 				self.sum_series(r'a720\.(b0|b1)\.monitor\.total_bw$', 'a720.PNC.monitor.sum_total_bw')
 				self.sum_series(r'a720\.(b0|b1)\.monitor\.total_bw\(r\+w\)', 'a720.PNC.monitor.sum_total_bw(r+w)')
+			self.changed = set()
 			self.post_processed = True
-		return self.all_series
+		return self.processed_series
@@ -0,0 +1,466 @@
+import re
+from time_series import Better
+import config
+
+# Patterns are compiled once and each one is guarded by a literal that must be
+# present in the line for the pattern to match, so most lines never reach the
+# regex engine.
+RE_VPU_FRAME = re.compile(r'Start testing frame (\d+)')
+RE_VPU_CYCLE = re.compile(r'Core id:(\d+).*cycles this frame , (\d+) cycle')
+RE_BPU_START = re.compile(r'Test: .*bpu.*started')
+RE_BPU_SUM = re.compile(r'BPU model\[(.*)\] sum: read_bw\[(\d+)\] MB/s; write_bw\[(\d+)\] MB/s')
+RE_BPU_FPS = re.compile(r'BPU model\[(.*)\].*fps\[(\d+)\]')
+RE_BPU_BW = re.compile(r'read_bw\[(\d+)\].*write_bw\[(\d+)\]')
+RE_VDSP_CORE = re.compile(r'VDSP Chip_Vi test function, Processor ID: \[(\d+)\]')
+RE_VDSP_BW = re.compile(r'DDR R/W Bandwidth: (.*) MB/s')
+RE_MPSTAT = re.compile(r'(all|\d+)\s+(\d+.\d+)\s+(\d+\.\d+)\s+(\d+\.\d+)\s+(\d+\.\d+)\s+(\d+\.\d+)\s+(\d+\.\d+)\s+(\d+\.\d+)\s+(\d+\.\d+)\s+(\d+\.\d+)')
+RE_PERF = re.compile(r',(instructions|cycles|cpu-clock|r60|r61|cache-misses),\d+')
+RE_CAM_PIPE = re.compile(r'(?:\[0m)?([a-z]+)(\d+) pipe info:')
+RE_CAM_FPS = re.compile(r' fps:(\d+\.\d+)')
+RE_CAM_OVERFLOW = re.compile(r' \[(\w+)\]\[(\w+)\] recv frm\(overflow/total\): \((\d+)/(\d+)\)')
+RE_DPU = re.compile(r'Display get (.*) frame done,fps = (\d+\.\d+), bw = (\d+)')
+RE_DPU_UNDERFLOW = re.compile(r'Display dpu(\d+) composer(\d+) underflow probability (\d+)%')
+RE_MEMCPY = re.compile(r'Core(\d+):.*cpu memcpy test bandwidth: (\d+) MB/s')
+RE_GPUA = re.compile(r'handle_output_ri.*diff:(\w+)')
+RE_CLPEAK = re.compile(r'clpeak float\s+:\s+(\d+\.\d+)')
+RE_MONITOR_START = re.compile(r'\*\*(Average|Full) Bandwidth\*\*')
+RE_MONITOR_COLOR = re.compile(r'(?:\[36m.*\[0m)(.*)')
+RE_MONITOR_VALUES = re.compile(r'^((\d+ +)+)')
+RE_MONITOR_BW = re.compile(r'^(.+): (\d+) ([KMG]+B/s)')
+RE_MONITOR_CHANNELS = re.compile(r'^(.+):(( +\d+)+)')
+RE_MONITOR_LIMIT_REQ = re.compile(r'(Read|Write): ((\d| )+)')
+RE_MONITOR_CHANNEL_BW = re.compile(r'(R Channel|W Channel): ((\d| )+)')
+
+# registered parsers by name, in the order they see each record
+PARSERS = {}
+
+def register_parser(cls):
+	PARSERS[cls.NAME] = cls
+	return cls
+
+class SubsystemParser:
+	"""
+	Parser of the records of one subsystem. parse() is only called for records
+	containing one of KEYWORDS, or for every record if there are none, and
+	returns True if it consumed the record so that later parsers skip it.
+	STATE lists the attributes carried between records with their initial
+	values. They live on the ScenarioParser so it can save and restore them.
+	COUNTERS are the numbers of STATE only used in series names and counted
+	up from where they are set, a chunk of the log can be parsed relatively to
+	their value before it.
+	"""
+	NAME = None
+	KEYWORDS = ()
+	STATE = {}
+	COUNTERS = ()
+
+	def parse(self, parser, timestamp, line):
+		raise NotImplementedError
+
+@register_parser
+class VpuParser(SubsystemParser):
+	NAME = 'vpu'
+	KEYWORDS = ('Start testing frame', 'cycles this frame')
+	STATE = {'vpu_frame': None}
+
+	def parse(self, parser, timestamp, line):
+		search = 'Start testing frame' in line and RE_VPU_FRAME.search(line)
+		if search:
+			parser.vpu_frame = int(search.group(1))
+			return True
+		search = 'cycles this frame' in line and RE_VPU_CYCLE.search(line)
+		if search and parser.vpu_frame != None and parser.vpu_frame == 1:
+			vpu_core = int(search.group(1))
+			if vpu_core == 0:
+				vpu_name = "0.jdec"
+			elif vpu_core == 1:
+				vpu_name = "1.jenc"
+			elif vpu_core == 2:
+				vpu_name = "2.vdec"
+			elif vpu_core == 3:
+				vpu_name = "3.venc0"
+			elif vpu_core == 4:
+				vpu_name = "4.venc1"
+			else:
+				vpu_name = f'{vpu_core}'
+			vpu_cycle = int(search.group(2))
+			parser.add_data(f'vpu.{vpu_name}.cycle', 'cycle', Better.LOWER, timestamp, vpu_cycle)
+			return True
+		return False
+
+@register_parser
+class BpuParser(SubsystemParser):
+	NAME = 'bpu'
+	KEYWORDS = ('started', 'BPU model[', 'write_bw[')
+	STATE = {'bpu_num': None, 'bpu_model': ""}
+	COUNTERS = ('bpu_num',)
+
+	def check_started(self, parser):
+		if parser.bpu_num is None:
+			raise ValueError("BPU result before any bpu test started")
+
+	def parse(self, parser, timestamp, line):
+		search = 'started' in line and RE_BPU_START.search(line)
+		if search:
+			parser.bpu_num = 0
+		search = 'BPU model[' in line and RE_BPU_SUM.search(line)
+		if search:
+			model = search.group(1)
+			read_bw = int(search.group(2))
+			write_bw = int(search.group(3))
+			bw = read_bw + write_bw
+			self.check_started(parser)
+			parser.add_data(f'bpu.{parser.bpu_num}.{model}.bw', 'MB/s', Better.HIGHER, timestamp, bw)
+			parser.bpu_num += 1
+			return True
+		search = 'BPU model[' in line and RE_BPU_FPS.search(line)
+		if search:
+			parser.bpu_model = search.group(1)
+			bpu_model_fps = int(search.group(2))
+			self.check_started(parser)
+			parser.add_data(f'bpu.{parser.bpu_num}.{parser.bpu_model}.fps', 'fps', Better.HIGHER, timestamp, bpu_model_fps)
+			return True
+		search = 'write_bw[' in line and parser.bpu_model != "" and RE_BPU_BW.search(line)
+		if search:
+			self.check_started(parser)
+			parser.add_data(f'bpu.{parser.bpu_num}.{parser.bpu_model}.read_bw', 'MB/s', Better.HIGHER, timestamp, int(search.group(1)))
+			parser.add_data(f'bpu.{parser.bpu_num}.{parser.bpu_model}.write_bw', 'MB/s', Better.HIGHER, timestamp, int(search.group(2)))
+			parser.bpu_num += 1
+			return True
+		return False
+
+@register_parser
+class VdspParser(SubsystemParser):
+	NAME = 'vdsp'
+	KEYWORDS = ('VDSP Chip_Vi', 'DDR R/W Bandwidth')
+	STATE = {'vdsp_core': None}
+	COUNTERS = ('vdsp_core',)
+
+	def parse(self, parser, timestamp, line):
+		search = 'VDSP Chip_Vi' in line and RE_VDSP_CORE.search(line)
+		if search:
+			parser.vdsp_core = int(search.group(1))
+			return True
+		search = 'DDR R/W Bandwidth' in line and parser.vdsp_core != None and RE_VDSP_BW.search(line)
+		if search:
+			bw = float(search.group(1)) * 2
+			parser.add_data(f'vdsp.{parser.vdsp_core}.copy_rw', 'MB/s', Better.HIGHER, timestamp, bw)
+			return True
+		return False
+
+@register_parser
+class MpstatParser(SubsystemParser):
+	NAME = 'mpstat'
+	KEYWORDS = ('.',)
+	STATE = {'mpstat_cnt': 0}
+
+	def parse(self, parser, timestamp, line):
+		# at least 8 literal dots are needed by the mpstat pattern
+		search = line.count('.') >= 8 and RE_MPSTAT.search(line)
+		if search:
+			cpu = search.group(1)
+			# the counter saturates, it is only used to skip the first samples
+			if cpu == 'all' and parser.mpstat_cnt <= 2:
+				parser.mpstat_cnt += 1
+			# skip the first 2 seconds
+			if parser.mpstat_cnt <= 2:
+				return True
+			busy = 100 - float(search.group(10))
+			parser.add_data(f'a720.linux.{cpu}.cpu_utilization', '%', Better.LOWER, timestamp, busy)
+			return True
+		return False
+
+@register_parser
+class PerfParser(SubsystemParser):
+	NAME = 'perf'
+	KEYWORDS = (',',)
+
+	def parse(self, parser, timestamp, line):
+		search = RE_PERF.search(line)
+		if not search:
+			return False
+		perf_output = line.strip().split(',')
+		perf_timestamp = int(float(perf_output[0]) * 1e9) + parser.offset
+		perf_counter = float(perf_output[1])
+		perf_name = perf_output[3]
+		metric = float(perf_output[6])
+		metric_unit = perf_output[7]
+		if config.config['scenario_importer.perf.with_raw_counter']:
+			parser.add_data(f'a720.PNC.perf.{perf_name}', 'count', Better.HIGHER, perf_timestamp, perf_counter)
+		metric_key = ""
+		if metric_unit == 'K/sec':
+			metric /= 1024
+		elif metric_unit == 'G/sec':
+			metric *= 1024
+		elif metric_unit == '/sec':
+			metric /= 1024 * 1024
+		elif metric_unit == 'M/sec':
+			pass
+		elif metric_unit == 'insn per cycle':
+			metric_key = 'a720.PNC.perf.ipc'
+			metric_unit = 'ipc'
+		elif metric_unit == "CPUs utilized":
+			metric_key = 'a720.PNC.perf.cpus'
+			metric_unit = 'count'
+
+		beat_size = config.config['bus.beat_size']
+		if perf_name == 'r60' or perf_name == 'r61':
+			if perf_name == 'r60':
+				metric_key = 'a720.PNC.perf.bus_access_rd'
+			else:
+				metric_key = 'a720.PNC.perf.bus_access_wr'
+			if beat_size > 0:
+				metric *= beat_size
+				metric_unit = 'MB/s'
+			else:
+				metric_unit = 'Mbeat/s'
+		elif perf_name == 'cache-misses':
+			metric_key = 'a720.PNC.perf.cache_miss'
+			metric_unit = '%'
+		if metric_key != "":
+			parser.add_data(metric_key, metric_unit, Better.HIGHER, perf_timestamp, metric)
+		return True
+
+@register_parser
+class CamParser(SubsystemParser):
+	NAME = 'cam'
+	KEYWORDS = (' pipe info:', ' fps:', 'recv frm(')
+	STATE = {'isp_module': "", 'isp_module_idx': None}
+
+	def parse(self, parser, timestamp, line):
+		search = ' pipe info:' in line and RE_CAM_PIPE.search(line)
+		if search:
+			parser.isp_module = search.group(1)
+			parser.isp_module_idx = search.group(2)
+			return True
+		search = ' fps:' in line and parser.isp_module != "" and RE_CAM_FPS.search(line)
+		if search:
+			fps = float(search.group(1))
+			parser.add_data(f'cam.{parser.isp_module}.{parser.isp_module_idx}.fps', 'fps', Better.HIGHER, timestamp, fps)
+			parser.isp_module = ""
+			parser.isp_module_idx = None
+			return True
+		# Disable hw_process_time because the data is not accurate
+		#search = re.search(r'max hw proc tm:(\d+\.\d+)ms', line)
+		#if search:
+		#	time = float(search.group(1))
+		#	key = f'cam.{parser.isp_module}.{parser.isp_module_idx}.hw_process_time'
+		#	parser.add_data(key, 'ms', Better.LOWER, timestamp, time)
+		#	return True
+		search = 'recv frm(' in line and RE_CAM_OVERFLOW.search(line)
+		if search:
+			mod0 = search.group(1)
+			mod1 = search.group(2)
+			overflow = float(search.group(3))
+			total = float(search.group(4))
+			parser.add_data(f"cam.{mod0}.{mod1}.overflow", '%', Better.HIGHER, timestamp, overflow/total)
+			return True
+		return False
+
+@register_parser
+class DpuParser(SubsystemParser):
+	NAME = 'dpu'
+	KEYWORDS = ('Display get ', 'underflow probability')
+
+	def parse(self, parser, timestamp, line):
+		search = 'Display get ' in line and RE_DPU.search(line)
+		if search:
+			if search.group(1) == 'dpu0':
+				prefix = 'dpu.0.'
+			elif search.group(1) == 'dpu1':
+				prefix = 'dpu.1.'
+			elif search.group(1) == 'wb':
+				prefix = 'dpu.'
+			elif search.group(1) == 'dpu0 compose0' or search.group(1) == 'dpu0 composer0':
+				prefix = 'dpu.0.composer.0.'
+			elif search.group(1) == 'dpu0 composer1':
+				prefix = 'dpu.0.composer.1.'
+			elif search.group(1) == 'dpu1 composer0':
+				prefix = 'dpu.1.composer.0.'
+			elif search.group(1) == 'dpu1 composer1':
+				prefix = 'dpu.1.composer.1.'
+			else:
+				raise Exception(f'Unknown display module {search.group(1)}')
+			parser.add_data(prefix + 'fps', 'fps', Better.HIGHER, timestamp, float(search.group(2)))
+			parser.add_data(prefix + 'bw', 'MB/s', Better.HIGHER, timestamp, int(search.group(3)) / 1024 / 1024)
+			return True
+		search = 'underflow probability' in line and RE_DPU_UNDERFLOW.search(line)
+		if search:
+			key = f'dpu.{search.group(1)}.composer.{search.group(2)}.underflow'
+			parser.add_data(key, '%', Better.LOWER, timestamp, int(search.group(3)))
+			return True
+		return False
+
+@register_parser
+class MemcpyParser(SubsystemParser):
+	NAME = 'memcpy'
+	KEYWORDS = ('cpu memcpy test bandwidth',)
+
+	def parse(self, parser, timestamp, line):
+		search = RE_MEMCPY.search(line)
+		if search:
+			core_id = int(search.group(1))
+			bw = int(search.group(2))
+			parser.add_data(f'a720.{core_id}.memcpy', 'MB/s', Better.HIGHER, timestamp, bw)
+			return True
+		return False
+
+@register_parser
+class GpuaParser(SubsystemParser):
+	NAME = 'gpua'
+	KEYWORDS = ('handle_output_ri',)
+
+	def parse(self, parser, timestamp, line):
+		search = RE_GPUA.search(line)
+		if search:
+			#fps = 1e9 / int("0x" + search.group(1), 16)
+			fps = 1e9 / int(search.group(1))
+			parser.add_data("gpua.fps", "fps", Better.HIGHER, timestamp, fps)
+			return True
+		return False
+
+@register_parser
+class ClpeakParser(SubsystemParser):
+	NAME = 'clpeak'
+	KEYWORDS = ('clpeak float',)
+
+	def parse(self, parser, timestamp, line):
+		search = RE_CLPEAK.search(line)
+		if search:
+			bw = float(search.group(1)) * 1024
+			parser.add_data('gpua.clpeak.float.bw', "MB/s", Better.HIGHER, timestamp, bw)
+		# the record is still seen by the bandwidth monitor
+		return False
+
+@register_parser
+class MonitorParser(SubsystemParser):
+	"""
+	Bandwidth monitor blocks. Once a block has started every record may belong
+	to it, so this parser has no keywords. monitor_timestamp is None outside of
+	a block, or in a block without a timestamp in the log.
+	"""
+	NAME = 'monitor'
+	STATE = {'monitor_timestamp': None, 'cam_idx': 0, 'monitor_name': ""}
+
+	def parse(self, parser, timestamp, line):
+		search = 'Bandwidth**' in line and RE_MONITOR_START.search(line)
+		if search:
+			# checked before the offset, which may shift timestamps below 0
+			if timestamp is not None and timestamp - parser.offset > 0:
+				parser.monitor_timestamp = timestamp
+			else:
+				parser.monitor_timestamp = None
+			parser.cam_idx = 0
+			return True
+		if parser.monitor_timestamp is not None:
+			# every monitor line but the latency values has a colon, a color code
+			# or leading digits, anything else only ends a latency block
+			if ':' not in line and '[36m' not in line and not line[:1].isdigit() and not line.startswith(('WB ', 'RL ', 'WL ')):
+				parser.monitor_name = ""
+				return False
+			# stripe leading color codes
+			search = '[36m' in line and RE_MONITOR_COLOR.search(line)
+			if search:
+				striped_line = search.group(1)
+			else:
+				striped_line = line
+			# the next line of bandwidth monitor is latency. The monitor name is
+			# only read when it makes a difference, so that a speculatively parsed
+			# chunk does not depend on it needlessly.
+			if striped_line.startswith('WB '):
+				metric = "write_bw"
+				prefix_len = 3
+				better = Better.HIGHER
+				unit = "MB/s"
+				end = False
+			elif striped_line.startswith('RL '):
+				metric = "read_latency"
+				prefix_len = 3
+				better = Better.LOWER
+				unit = "ns"
+				end = False
+			elif striped_line.startswith('WL '):
+				metric = "write_latency"
+				prefix_len = 3
+				better = Better.LOWER
+				unit = "ns"
+				end = True
+			else:
+				metric = "latency"
+				prefix_len = 0
+				better = Better.LOWER
+				unit = "ns"
+				end = True
+			values_line = striped_line[prefix_len:]
+			search = values_line[:1].isdigit() and RE_MONITOR_VALUES.search(values_line+" ")
+			if search and parser.monitor_name != "":
+				for i, v in enumerate(search.group(1).strip().split()):
+					parser.add_data(f'{parser.monitor_name}.monitor.{i}.{metric}', unit, better, parser.monitor_timestamp, int(v))
+				if end:
+					parser.monitor_name = ""
+				return True
+			if prefix_len > 0 and parser.monitor_name != "":
+				striped_line = values_line
+			if end:
+				parser.monitor_name = ""
+			# now check the orginal bandwidth monitor line
+			search = 'B/s' in striped_line and RE_MONITOR_BW.search(striped_line)
+			if search:
+				name = search.group(1).lower()
+				if name.endswith(' read'):
+					rw = 'read'
+					name = name[:-5]
+				elif name.endswith(' write'):
+					rw = 'write'
+					name = name[:-6]
+				elif name.endswith(' total'):
+					rw = 'total'
+					name = name[:-6]
+				else:
+					rw = 'total'
+
+				# workaround for duplicate cam
+				if name == 'cam':
+					parser.cam_idx += 1
+					if parser.cam_idx % 2 == 0:
+						return True
+				if name == 'cpu':
+					name = 'a720.PNC'
+				elif name.startswith('cpu '):
+					name = name.replace('cpu ', 'a720.')
+
+				name = name.replace(' ', '_')
+				parser.add_data(f'{name}.monitor.{rw}_bw', search.group(3), Better.HIGHER, parser.monitor_timestamp, int(search.group(2)))
+				return True
+			else:
+				search = ':' in striped_line and RE_MONITOR_CHANNELS.search(striped_line)
+				if search:
+					parser.monitor_name = search.group(1).lower()
+					if parser.monitor_name.endswith(' rb'):
+						parser.monitor_name = parser.monitor_name[:-3]
+						rw = 'read'
+					else:
+						rw = 'total'
+					for i, v in enumerate(search.group(2).strip().split()):
+						parser.add_data(f'{parser.monitor_name}.monitor.{i}.{rw}_bw', "MB/s", Better.HIGHER, parser.monitor_timestamp, int(v))
+					return True
+			# for ddr limit req
+			if config.config['scenario_importer.monitor.with_limit_req']:
+				search = ('Read: ' in striped_line or 'Write: ' in striped_line) and RE_MONITOR_LIMIT_REQ.search(striped_line)
+				if search:
+					rw = search.group(1).lower()
+					for i, v in enumerate(search.group(2).split()):
+						parser.add_data(f'ddr.{i}.{rw}.monitor.limit_req', 'count', Better.HIGHER, parser.monitor_timestamp, int(v))
+					return True
+			if config.config['scenario_importer.monitor.with_channel_bw']:
+				search = ' Channel: ' in striped_line and RE_MONITOR_CHANNEL_BW.search(striped_line)
+				if search:
+					rw = search.group(1).lower()
+					if rw == 'r channel':
+						rw = 'read'
+					elif rw == 'w channel':
+						rw = 'write'
+					for i, v in enumerate(search.group(2).split()):
+						parser.add_data(f'ddr.{i}.monitor.{rw}_bw', 'MB/s', Better.HIGHER, parser.monitor_timestamp, int(v))
+					return True
+		return False
@@ -0,0 +1,134 @@
+import os
+import json
+import time
+import hashlib
+import functools
+import numpy as np
+from time_series import Better
+from time_series import RegularColumn
+from series_store import SeriesStore, SeriesBlock, LazySeriesBlock
+import config
+
+# bump when the parsers or the post processing change their output
+CACHE_VERSION = 4
+
+
+def file_fingerprint(path, block_size=1024 * 1024):
+	"""
+	Identify the content of a file by its size, mtime and a hash of its first
+	and last blocks, which is cheap even for logs of many GB.
+	"""
+	stat = os.stat(path)
+	digest = hashlib.blake2b(digest_size=16)
+	with open(path, 'rb') as f:
+		digest.update(f.read(block_size))
+		if stat.st_size > block_size:
+			f.seek(max(block_size, stat.st_size - block_size))
+			digest.update(f.read(block_size))
+	return [os.path.abspath(path), stat.st_size, stat.st_mtime_ns, digest.hexdigest()]
+
+
+class SeriesCache:
+	"""
+	On-disk cache of post-processed series, keyed on the input files and the
+	parser options in config. Entries not used for max_age seconds are removed,
+	and the least recently used ones once the cache exceeds max_size bytes.
+	"""
+	def __init__(self, cache_dir, max_size, max_age):
+		self.cache_dir = cache_dir
+		self.max_size = max_size
+		self.max_age = max_age
+
+	def make_key(self, importer, files):
+		# time_series.float32 changes the dtype of the stored data
+		parser_config = {k: v for k, v in config.config.items() if k.startswith('scenario_importer.') or k.startswith('bus.') or k == 'time_series.float32'}
+		key = {
+			"version": CACHE_VERSION,
+			"importer": type(importer).__name__,
+			"files": [file_fingerprint(path) + [offset] for path, offset in files],
+			"config": parser_config,
+		}
+		return hashlib.sha256(json.dumps(key, sort_keys=True).encode()).hexdigest()
+
+	def get_path(self, key):
+		return os.path.join(self.cache_dir, f'{key}.npz')
+
+	def load(self, key, lazy=False):
+		"""
+		SeriesStore of the entry, or None if there is none. With lazy, the
+		blocks of the store are only read from the entry when used.
+		"""
+		path = self.get_path(key)
+		if not os.path.exists(path):
+			return None
+		npz = None
+		try:
+			# the zip directory is read once, lazy blocks share the open file
+			npz = np.load(path, allow_pickle=False)
+			meta = json.loads(str(npz['meta']))
+			store = SeriesStore()
+			for i, (names, has_timestamp) in enumerate(meta["blocks"]):
+				load = functools.partial(self.load_block, npz, i, has_timestamp)
+				store.blocks.append(LazySeriesBlock(load, names) if lazy else SeriesBlock(*load(), names))
+			for name, unit, better, i, row in meta["series"]:
+				store.index[name] = (store.blocks[i], row, unit, Better[better])
+		except Exception as e:
+			if npz is not None:
+				npz.close()
+			print(f'Warning: ignoring broken cache {path}: {e}')
+			return None
+		if not lazy:
+			npz.close()
+		# mtime tracks the last use for eviction
+		os.utime(path)
+		return store
+
+	def load_block(self, npz, i, has_timestamp):
+		timestamp = RegularColumn.from_array(npz[f'timestamp{i}']) if has_timestamp else None
+		return timestamp, npz[f'data{i}']
+
+	def store(self, key, all_series):
+		"""
+		Store the series in the blocks of a SeriesStore, so that the timestamps
+		shared by series are stored once.
+		"""
+		os.makedirs(self.cache_dir, exist_ok=True)
+		all_series = SeriesStore.from_series(all_series)
+		meta = {"blocks": [], "series": []}
+		arrays = {}
+		blocks = {}
+		for name, (block, row, unit, better) in all_series.index.items():
+			i = blocks.get(id(block))
+			if i is None:
+				i = blocks[id(block)] = len(meta["blocks"])
+				meta["blocks"].append([block.names, block.timestamp is not None])
+				if block.timestamp is not None:
+					arrays[f'timestamp{i}'] = block.timestamp.view()
+				arrays[f'data{i}'] = block.data
+			meta["series"].append([name, unit, better.name, i, row])
+		arrays['meta'] = np.array(json.dumps(meta))
+		path = self.get_path(key)
+		tmp_path = f'{path}.{os.getpid()}.tmp'
+		with open(tmp_path, 'wb') as f:
+			np.savez(f, **arrays)
+		os.replace(tmp_path, path)
+		self.evict()
+
+	def evict(self):
+		entries = []
+		now = time.time()
+		for name in os.listdir(self.cache_dir):
+			if not name.endswith('.npz'):
+				continue
+			path = os.path.join(self.cache_dir, name)
+			stat = os.stat(path)
+			if now - stat.st_mtime > self.max_age:
+				os.remove(path)
+			else:
+				entries.append((stat.st_mtime, stat.st_size, path))
+		total_size = sum(size for _, size, _ in entries)
+		for _, size, path in sorted(entries):
+			if total_size <= self.max_size:
+				break
+			os.remove(path)
+			total_size -= size
@@ -1,8 +1,53 @@
+import re
 import sys
 import numpy as np
 from time_series import TimeSeries
 from time_series import Better
 
+# characters only found in arrays of floats, such as 1., 1e+20, nan and inf
+FLOAT_CHARS = re.compile("[.eEnNiI]")
+# elements formatted at once when writing an array
+CHUNK_SIZE = 64 * 1024
+
+
+def write_array(f, values):
+	"""
+	Write values as a list literal, formatting CHUNK_SIZE elements at a time
+	instead of building the string of the whole array.
+	"""
+	f.write("[")
+	for begin in range(0, len(values), CHUNK_SIZE):
+		if begin > 0:
+			f.write(",")
+		f.write(",".join(map(str, values[begin:begin + CHUNK_SIZE].tolist())))
+	f.write("]")
+
+
+def parse_array(text):
+	"""
+	Array of a list literal written by write_array, or by np.array2string in
+	older files. Holds floats if any element does, like the list would.
+	"""
+	text = text.strip()
+	if not text.startswith("[") or not text.endswith("]"):
+		raise ValueError(f'Invalid array "{text[:32]}"')
+	text = text[1:-1]
+	if text.strip() == "":
+		return np.empty(0)
+	dtype = np.float64 if FLOAT_CHARS.search(text) else np.int64
+	values = np.fromstring(text, dtype=dtype, sep=",")
+	if len(values) != text.count(",") + 1:
+		raise ValueError(f'Invalid array "[{text[:32]}"')
+	return values
+
+
+def parse_better(text):
+	"""
+	Better of its str, such as Better.HIGHER.
+	"""
+	return Better[text.strip().split(".")[-1]]
+
+
 def save(path, all_series, prefix=""):
 	if path == "":
 		f = sys.stdout
@@ -10,30 +55,28 @@ def save(path, all_series, prefix=""):
 		f = open(path, 'a')
 	try:
 		for name, series in all_series.items():
-			with np.printoptions(threshold=np.inf, linewidth=np.inf):
-				f.write("series: ")
-				if prefix != "":
-					f.write(f'{prefix}.{name}')
-				else:
-					f.write(name)
-				f.write("\n")
-				f.write("unit: ")
-				f.write(str(series.get_unit()))
-				f.write("\n")
-				f.write("better: ")
-				f.write(str(series.get_better()))
-				f.write("\n")
-				f.write("timestamp: ")
-				ts = series.get_timestamp_series()
-				if series.is_timestamp_valid():
-					f.write(np.array2string(ts, separator=","))
-				else:
-					f.write("None")
-				f.write("\n")
-				f.write("data: ")
-				f.write(np.array2string(series.get_data_series(), separator=","))
-				f.write("\n")
-				f.write("series end\n")
+			f.write("series: ")
+			if prefix != "":
+				f.write(f'{prefix}.{name}')
+			else:
+				f.write(name)
+			f.write("\n")
+			f.write("unit: ")
+			f.write(str(series.get_unit()))
+			f.write("\n")
+			f.write("better: ")
+			f.write(str(series.get_better()))
+			f.write("\n")
+			f.write("timestamp: ")
+			if series.is_timestamp_valid():
+				write_array(f, series.get_timestamp_series())
+			else:
+				f.write("None")
+			f.write("\n")
+			f.write("data: ")
+			write_array(f, series.get_data_series())
+			f.write("\n")
+			f.write("series end\n")
 	except Exception as e:
 		raise e
 	finally:
@@ -51,24 +94,23 @@ class SeriesImporter:
 			better = ""
 			data = None
 			timestamp = None
-			lines = f.readlines()
-			for line in lines:
+			for line in f:
 				if line.startswith("series:"):
 					name = line[7:].strip()
 				elif line.startswith("unit:"):
 					unit = line[5:].strip()
 				elif line.startswith("better:"):
-					better = eval(line[7:].strip())
+					better = parse_better(line[7:])
 				elif line.startswith("timestamp:"):
 					timestamp = line[10:].strip()
 					if timestamp == "None":
 						timestamp = []
 					else:
-						timestamp = eval(timestamp)
-					if offset != 0:
-						timestamp = [t + offset for t in timestamp]
+						timestamp = parse_array(timestamp)
+						if offset != 0:
+							timestamp = timestamp + offset
 				elif line.startswith("data:"):
-					data = eval(line[5:].strip())
+					data = parse_array(line[5:])
 				elif line.startswith("series end"):
 					self.all_series[name] = TimeSeries(timestamp, data, unit, better)
 					name = ""
@@ -77,6 +119,9 @@ class SeriesImporter:
 					data = None
 					timestamp = None
 	
+	def merge_series(self, all_series):
+		self.all_series.update(all_series)
+
 	def get_all_series(self):
 		return self.all_series
 				
@@ -0,0 +1,250 @@
+import re
+import numpy as np
+from collections.abc import MutableMapping
+from time_series import TimeSeries, LazySeries, RegularColumn, find_window
+
+
+class SeriesBlock(object):
+	"""
+	Series sharing one timestamp column, their data is a 2D array with one row
+	per series. Series without timestamps have no timestamp column.
+	"""
+	__slots__ = ('timestamp', 'data', 'names')
+
+	def __init__(self, timestamp: RegularColumn, data: np.ndarray, names: list) -> None:
+		self.timestamp = timestamp
+		self.data = data
+		self.names = names
+
+	def get_timestamp_column(self) -> RegularColumn:
+		if self.timestamp is not None:
+			return self.timestamp
+		return RegularColumn(start=0, step=1, size=self.data.shape[1])
+
+	def get_series(self, row: int, unit: str, better) -> TimeSeries:
+		"""
+		Series of a row, sharing the arrays of the block.
+		"""
+		series = TimeSeries(None, self.data[row], unit, better)
+		if self.timestamp is not None:
+			# a column of its own, so that appending to the series does not
+			# change the block
+			series.timestamp = self.timestamp.slice(0, len(self.timestamp))
+		return series
+
+	def slice(self, start, end) -> "SeriesBlock":
+		"""
+		Block of the samples TimeSeries.slice(start, end) keeps.
+		"""
+		timestamps = self.get_timestamp_column()
+		begin, end = find_window(timestamps, start, end)
+		return SeriesBlock(timestamps.slice(begin, end), self.data[:, begin:end], self.names)
+
+
+class LazySeriesBlock(SeriesBlock):
+	"""
+	SeriesBlock whose timestamps and data are only read, by calling load, when
+	first used.
+	"""
+	__slots__ = ('load',)
+
+	def __init__(self, load, names: list) -> None:
+		self.load = load
+		self.names = names
+
+	def __getattr__(self, name):
+		# only called while the timestamp and data slots are not set
+		if name not in ('timestamp', 'data') or self.load is None:
+			raise AttributeError(name)
+		self.timestamp, self.data = self.load()
+		self.load = None
+		return getattr(self, name)
+
+
+class SeriesRefBlock(object):
+	"""
+	Block of a single series kept by reference, for series that are better not
+	copied: a LazySeries is only loaded once used and memory mapped data stays
+	in the file.
+	"""
+	__slots__ = ('series', 'names')
+
+	def __init__(self, series, names: list) -> None:
+		self.series = series
+		self.names = names
+
+	@property
+	def timestamp(self) -> RegularColumn:
+		return self.series.timestamp if self.series.is_timestamp_valid() else None
+
+	@property
+	def data(self) -> np.ndarray:
+		return self.series.get_data_series()[np.newaxis]
+
+	def get_timestamp_column(self) -> RegularColumn:
+		return self.series.get_timestamp_column()
+
+	def get_series(self, row: int, unit: str, better):
+		return self.series
+
+	def slice(self, start, end) -> "SeriesRefBlock":
+		return SeriesRefBlock(self.series.slice(start, end), self.names)
+
+
+def is_memory_mapped(values: np.ndarray) -> bool:
+	while values is not None:
+		if isinstance(values, np.memmap):
+			return True
+		values = getattr(values, 'base', None)
+	return False
+
+
+def get_timestamp_key(series: TimeSeries):
+	"""
+	Key of the timestamps of series, equal for series with equal timestamps
+	and almost never otherwise.
+	"""
+	if not series.is_timestamp_valid():
+		return (None, series.count())
+	column = series.timestamp
+	if column.regular:
+		return (column.start, column.step, len(column))
+	return (len(column), hash(column.view().tobytes()))
+
+
+class SeriesStore(MutableMapping):
+	"""
+	Mapping of names to series, that keeps the series with the same timestamps
+	and dtype in one SeriesBlock, so that their timestamps are stored once and
+	operations across them are vectorized over the rows of the blocks.
+	Series are read as TimeSeries sharing the arrays of the blocks. Lazy and
+	memory mapped series are kept as they are in a SeriesRefBlock.
+	"""
+	def __init__(self) -> None:
+		self.blocks = []
+		# name to (block, row, unit, better)
+		self.index = {}
+		# series already read, which keep their cached stats
+		self.series = {}
+
+	@classmethod
+	def from_series(cls, all_series, release=False) -> "SeriesStore":
+		"""
+		Store of the series of a mapping. With release, each series is popped
+		from all_series once copied in its block, so that its arrays can be
+		freed while the next blocks are built.
+		"""
+		if isinstance(all_series, SeriesStore):
+			return all_series
+		store = cls()
+		names = list(all_series)
+		groups = {}
+		for name, series in all_series.items():
+			if isinstance(series, LazySeries) or is_memory_mapped(series.get_data_series()):
+				block = SeriesRefBlock(series, [name])
+				store.blocks.append(block)
+				store.index[name] = (block, 0, series.get_unit(), series.get_better())
+				continue
+			key = (get_timestamp_key(series), series.get_data_series().dtype)
+			members = groups.setdefault(key, [])
+			if len(members) > 0 and not all_series[members[0]].get_timestamp_column().same_prefix(series.get_timestamp_column(), series.count()):
+				# another series with the same key, keep it apart
+				members = groups.setdefault(key + (name,), [])
+			members.append(name)
+		for (key, dtype, *_), members in groups.items():
+			first = all_series[members[0]]
+			data = np.empty((len(members), first.count()), dtype=dtype)
+			timestamp = first.timestamp.slice(0, first.count()) if first.is_timestamp_valid() else None
+			block = SeriesBlock(timestamp, data, members)
+			store.blocks.append(block)
+			for row, name in enumerate(members):
+				series = all_series.pop(name) if release else all_series[name]
+				data[row] = series.get_data_series()
+				store.index[name] = (block, row, series.get_unit(), series.get_better())
+		if release:
+			for name in names:
+				all_series.pop(name, None)
+		store.index = {name: store.index[name] for name in names}
+		return store
+
+	def __getitem__(self, name: str) -> TimeSeries:
+		series = self.series.get(name)
+		if series is None:
+			block, row, unit, better = self.index[name]
+			series = self.series[name] = block.get_series(row, unit, better)
+		return series
+
+	def __setitem__(self, name: str, series: TimeSeries) -> None:
+		"""
+		Add a series in a block of its own, from_series groups many at once.
+		"""
+		self.pop(name, None)
+		timestamp = series.timestamp.slice(0, series.count()) if series.is_timestamp_valid() else None
+		block = SeriesBlock(timestamp, series.get_data_series()[np.newaxis], [name])
+		self.blocks.append(block)
+		self.index[name] = (block, 0, series.get_unit(), series.get_better())
+		self.series[name] = series
+
+	def __delitem__(self, name: str) -> None:
+		del self.index[name]
+		self.series.pop(name, None)
+
+	def __iter__(self):
+		return iter(self.index)
+
+	def __len__(self) -> int:
+		return len(self.index)
+
+	def __contains__(self, name) -> bool:
+		return name in self.index
+
+	def select(self, names) -> "SeriesStore":
+		"""
+		Store of some of the series, sharing the blocks of this one.
+		"""
+		store = SeriesStore()
+		for name in names:
+			store.index[name] = self.index[name]
+			if name in self.series:
+				store.series[name] = self.series[name]
+		store.blocks = list({id(block): block for block, row, unit, better in store.index.values()}.values())
+		return store
+
+	def filter(self, pattern: str) -> "SeriesStore":
+		"""
+		Store of the series whose name matches the regex.
+		"""
+		regex = re.compile(pattern)
+		return self.select([name for name in self.index if regex.search(name)])
+
+	def slice(self, start, end) -> "SeriesStore":
+		"""
+		Store of the samples TimeSeries.slice(start, end) keeps, the window is
+		searched once per block.
+		"""
+		if start is None and end is None or start == end:
+			return self
+		blocks = {}
+		store = SeriesStore()
+		for name, (block, row, unit, better) in self.index.items():
+			if id(block) not in blocks:
+				blocks[id(block)] = block.slice(start, end)
+				store.blocks.append(blocks[id(block)])
+			store.index[name] = (blocks[id(block)], row, unit, better)
+		return store
+
+	def values_at(self, timestamp) -> dict:
+		"""
+		Value of each series at its last sample at or before timestamp, a time
+		cursor looked up once per block.
+		"""
+		values = {}
+		for block in self.blocks:
+			index = block.get_timestamp_column().search([int(np.floor(timestamp)) + 1])[0] - 1
+			if index < 0:
+				continue
+			column = block.data[:, index]
+			for row, name in enumerate(block.names):
+				if self.index.get(name, (None,))[0] is block:
+					values[name] = column[row]
+		return values
@@ -0,0 +1,67 @@
+import numpy as np
+
+
+class TDigest(object):
+	"""
+	Mergeable sketch of the distribution of values for estimating quantiles,
+	see Dunning and Ertl, "Computing Extremely Accurate Quantiles Using
+	t-Digests". Values are summarised by at most about compression / 2
+	weighted centroids, which are small near the tails so that p99 stays
+	accurate, whatever the number of values.
+	"""
+	# values are added in batches of at most this size to bound memory
+	BATCH_SIZE = 1024 * 1024
+
+	def __init__(self, compression=400) -> None:
+		self.compression = compression
+		self.means = np.empty(0)
+		self.weights = np.empty(0)
+		self.count = 0
+		self.minimum = np.inf
+		self.maximum = -np.inf
+
+	def update(self, values) -> None:
+		values = np.asarray(values, dtype=np.float64)
+		for start in range(0, len(values), self.BATCH_SIZE):
+			batch = np.sort(values[start:start + self.BATCH_SIZE])
+			self.add_centroids(batch, np.ones(len(batch)))
+
+	def merge(self, other: "TDigest") -> None:
+		self.add_centroids(other.means, other.weights)
+		self.minimum = min(self.minimum, other.minimum)
+		self.maximum = max(self.maximum, other.maximum)
+
+	def add_centroids(self, means, weights) -> None:
+		"""
+		Merge centroids sorted by mean into the digest and compress it again.
+		"""
+		if len(means) == 0:
+			return
+		self.minimum = min(self.minimum, means[0])
+		self.maximum = max(self.maximum, means[-1])
+		index = np.searchsorted(means, self.means)
+		means = np.insert(means, index, self.means)
+		weights = np.insert(weights, index, self.weights)
+		total = weights.sum()
+		# group the centroids by the unit interval of the k1 scale function
+		# their left edge falls in, the groups are small near the tails
+		q = (np.cumsum(weights) - weights) / total
+		k = self.compression / (2 * np.pi) * np.arcsin(2 * q - 1)
+		group = np.floor(k)
+		starts = np.flatnonzero(np.concatenate(([True], group[1:] != group[:-1])))
+		self.weights = np.add.reduceat(weights, starts)
+		self.means = np.add.reduceat(means * weights, starts) / self.weights
+		self.count = int(total)
+
+	def quantile(self, q: float) -> float:
+		"""
+		Estimated value below which a fraction q of the values lie.
+		"""
+		if len(self.means) == 0:
+			return 0
+		if len(self.means) == 1:
+			return self.means[0]
+		centers = np.cumsum(self.weights) - self.weights / 2
+		positions = np.concatenate(([0], centers, [self.count]))
+		values = np.concatenate(([self.minimum], self.means, [self.maximum]))
+		return np.interp(q * self.count, positions, values)
@@ -1,54 +1,467 @@
+import logging
+import weakref
 import numpy as np
 import enum
+from array import array
+from tdigest import TDigest
+from config import config
+
+logger = logging.getLogger(__name__)
+
 
 class Better(enum.Enum):
 	HIGHER = 1
 	LOWER = 2
 
 
-class TimeSeries(object):
-	def __init__(self, timestamp_ns: list, data: list, unit: str, better: Better) -> None:
+# array.array type codes of the dtypes a column can hold
+TYPECODES = {np.dtype(np.int64): 'q', np.dtype(np.float64): 'd', np.dtype(np.float32): 'f'}
+
+
+class Column(object):
+	"""
+	Growable column of values in a numpy array with spare capacity, so that
+	growing is amortised O(1). Appended values are first collected in a small
+	array.array and moved to the numpy array when the values are read. Without
+	a fixed dtype, integers are kept as int64 until something else is added,
+	which is the dtype np.array() would infer for the same list. The values
+	are read through view(), a read-only array that stays valid after later
+	appends.
+	"""
+	__slots__ = ('dtype', 'buffer', 'pending', 'size', 'cached_view')
+
+	def __init__(self, dtype=None) -> None:
+		self.dtype = dtype
+		self.buffer = np.empty(0, dtype=np.int64 if dtype is None else dtype)
+		self.pending = array(TYPECODES[self.buffer.dtype])
+		# number of values, including the pending ones
+		self.size = 0
+		self.cached_view = None
+
+	@classmethod
+	def from_array(cls, values: np.ndarray, dtype=None) -> "Column":
+		"""
+		Column holding values without copying them. The array is never written
+		to, growing the column moves the values to a new buffer.
+		"""
+		column = cls(dtype)
+		if len(values) == 0:
+			return column
+		if dtype is not None:
+			values = values.astype(dtype, copy=False)
+		elif values.dtype.kind in 'biu':
+			values = values.astype(np.int64, copy=False)
+		elif values.dtype not in TYPECODES:
+			values = values.astype(np.float64)
+		column.buffer = values
+		column.pending = array(TYPECODES[values.dtype])
+		column.size = len(values)
+		return column
+
+	def __len__(self) -> int:
+		return self.size
+
+	def reserve(self, size: int, dtype=None) -> None:
+		if dtype is None:
+			dtype = self.buffer.dtype
+		if size <= len(self.buffer) and dtype == self.buffer.dtype:
+			return
+		committed = self.size - len(self.pending)
+		buffer = np.empty(max(size, len(self.buffer) + len(self.buffer) // 2, 16), dtype=dtype)
+		buffer[:committed] = self.buffer[:committed]
+		self.buffer = buffer
+
+	def flush(self) -> None:
+		"""
+		Move the pending values to the numpy array.
+		"""
+		count = len(self.pending)
+		if count == 0:
+			return
+		committed = self.size - count
+		self.reserve(self.size)
+		self.buffer[committed:self.size] = np.frombuffer(self.pending, dtype=self.buffer.dtype)
+		self.pending = array(self.pending.typecode)
+
+	def promote(self) -> None:
+		"""
+		Switch an integer column to float64.
+		"""
+		self.flush()
+		self.reserve(len(self.buffer), np.float64)
+		self.pending = array('d')
+
+	def append(self, value) -> None:
+		try:
+			self.pending.append(value)
+		except (TypeError, OverflowError):
+			if self.dtype is not None:
+				self.pending.append(np.array(value).astype(self.dtype).item())
+			else:
+				self.promote()
+				self.pending.append(value)
+		self.size += 1
+		self.cached_view = None
+
+	def extend(self, values) -> None:
+		values = np.asarray(values)
+		if len(values) == 0:
+			return
+		if self.dtype is None and self.buffer.dtype.kind in 'biu' and values.dtype.kind not in 'biu':
+			self.promote()
+		self.flush()
+		self.reserve(self.size + len(values))
+		self.buffer[self.size:self.size + len(values)] = values
+		self.size += len(values)
+		self.cached_view = None
+
+	def get_dtype(self):
+		return self.buffer.dtype
+
+	def view(self) -> np.ndarray:
+		"""
+		Read-only array of the values, shared with the column.
+		"""
+		if self.cached_view is None:
+			self.flush()
+			self.cached_view = self.buffer[:self.size]
+			self.cached_view.flags.writeable = False
+		return self.cached_view
+
+	def search(self, values) -> np.ndarray:
+		"""
+		np.searchsorted of values in the column, which must be sorted.
+		"""
+		return np.searchsorted(self.view(), values)
+
+	def last(self):
+		return self.view()[-1]
+
+	def same_prefix(self, other: "Column", n: int) -> bool:
+		"""
+		Whether the first n values of both columns are equal.
+		"""
+		return np.array_equal(self.view()[:n], other.view()[:n])
+
+
+class RegularColumn(Column):
+	"""
+	Column of int64 values, like timestamps, that only stores start, step and
+	size while the values increase by a constant step, and becomes a plain
+	Column once a value off that grid is added. view() of a regular column
+	computes the values, which are only kept while they are used elsewhere.
+	"""
+	__slots__ = ('regular', 'start', 'step')
+
+	def __init__(self, start=0, step=0, size=0) -> None:
+		super().__init__(np.int64)
+		self.regular = True
+		self.start = start
+		# unknown until the second value
+		self.step = step
+		self.size = size
+
+	@classmethod
+	def from_array(cls, values: np.ndarray) -> "RegularColumn":
+		column = cls()
+		if len(values) > 0:
+			column.assign(values.astype(np.int64, copy=False))
+		return column
+
+	def assign(self, values: np.ndarray) -> None:
 		"""
-		timestamp should in nanoseconds
+		Replace all the values, kept as start and step if they fit.
 		"""
-		self.timestamp = timestamp_ns
+		start = int(values[0]) if len(values) > 0 else 0
+		step = int(values[1]) - start if len(values) > 1 else 0
+		if len(values) <= 1 or step > 0 and np.array_equal(values, start + step * np.arange(len(values))):
+			self.regular = True
+			self.start = start
+			self.step = step
+			self.buffer = np.empty(0, dtype=np.int64)
+		else:
+			self.regular = False
+			self.buffer = values
+		self.pending = array('q')
+		self.size = len(values)
+		self.cached_view = None
+
+	def materialize(self) -> None:
+		"""
+		Store the values of a regular column like a plain Column does.
+		"""
+		if self.regular:
+			self.buffer = self.start + self.step * np.arange(self.size, dtype=np.int64)
+			self.regular = False
+			self.cached_view = None
+
+	def append(self, value) -> None:
+		if not self.regular:
+			# Column.append for the fixed int64 dtype, inlined as it is called
+			# for every parsed sample
+			try:
+				self.pending.append(value)
+			except (TypeError, OverflowError):
+				self.pending.append(np.array(value).astype(np.int64).item())
+			self.size += 1
+			self.cached_view = None
+			return
+		if self.size > 1 and value == self.start + self.step * self.size:
+			self.size += 1
+			return
+		if self.size == 0 and isinstance(value, (int, np.integer)):
+			self.start = int(value)
+			self.size = 1
+			return
+		if self.size == 1 and isinstance(value, (int, np.integer)) and value > self.start:
+			self.step = int(value) - self.start
+			self.size = 2
+			return
+		self.materialize()
+		Column.append(self, value)
+
+	def extend(self, values) -> None:
+		values = np.asarray(values)
+		if len(values) == 0:
+			return
+		if self.regular and self.size > 1 and values.dtype.kind in 'iu':
+			if np.array_equal(values, self.start + self.step * np.arange(self.size, self.size + len(values))):
+				self.size += len(values)
+				return
+		if self.regular and self.size <= 1:
+			self.assign(np.concatenate((self.view(), values.astype(np.int64, copy=False))))
+			return
+		self.materialize()
+		super().extend(values)
+
+	def view(self) -> np.ndarray:
+		if not self.regular:
+			return super().view()
+		values = self.cached_view() if self.cached_view is not None else None
+		if values is None or len(values) != self.size:
+			values = self.start + self.step * np.arange(self.size, dtype=np.int64)
+			values.flags.writeable = False
+			self.cached_view = weakref.ref(values)
+		return values
+
+	def search(self, values) -> np.ndarray:
+		if not self.regular or self.step == 0:
+			return super().search(values)
+		values = np.asarray(values)
+		if values.dtype.kind in 'iu':
+			index = -((self.start - values) // self.step)
+		else:
+			index = np.ceil((values - self.start) / self.step)
+		return np.clip(index, 0, self.size).astype(np.int64)
+
+	def last(self):
+		if not self.regular:
+			return super().last()
+		return self.start + self.step * (self.size - 1)
+
+	def same_prefix(self, other: Column, n: int) -> bool:
+		if self.regular and isinstance(other, RegularColumn) and other.regular and n > 1:
+			return self.start == other.start and self.step == other.step
+		return super().same_prefix(other, n)
+
+	def slice(self, begin: int, end: int) -> "RegularColumn":
+		"""
+		Column of values [begin, end), sharing the array of this one.
+		"""
+		if self.regular:
+			return RegularColumn(start=self.start + self.step * begin, step=self.step, size=max(0, end - begin))
+		column = RegularColumn()
+		column.materialize()
+		column.buffer = self.view()[begin:end]
+		column.size = len(column.buffer)
+		return column
+
+
+class SeriesStats(object):
+	"""
+	Count, min, max, mean and sum of squared deviations (m2) of some values.
+	Stats of consecutive parts of a series merge into the stats of the whole,
+	see Chan et al., "Updating Formulae and a Pairwise Algorithm for Computing
+	Sample Variances".
+	"""
+	# values are read in chunks small enough to stay in the CPU cache
+	CHUNK_SIZE = 64 * 1024
+
+	def __init__(self, count=0, minimum=0, maximum=0, mean=0.0, m2=0.0) -> None:
+		self.count = count
+		self.minimum = minimum
+		self.maximum = maximum
+		self.mean = mean
+		self.m2 = m2
+
+	@classmethod
+	def of(cls, values: np.ndarray) -> "SeriesStats":
+		stats = cls()
+		for start in range(0, len(values), cls.CHUNK_SIZE):
+			chunk = values[start:start + cls.CHUNK_SIZE]
+			mean = chunk.mean()
+			stats = stats.merge(cls(len(chunk), chunk.min(), chunk.max(), mean, np.square(chunk - mean).sum()))
+		return stats
+
+	def merge(self, other: "SeriesStats") -> "SeriesStats":
+		if self.count == 0:
+			return other
+		if other.count == 0:
+			return self
+		count = self.count + other.count
+		delta = other.mean - self.mean
+		mean = self.mean + delta * other.count / count
+		m2 = self.m2 + other.m2 + delta * delta * self.count * other.count / count
+		return SeriesStats(count, min(self.minimum, other.minimum), max(self.maximum, other.maximum), mean, m2)
+
+	def get_std(self) -> float:
+		if self.count == 0:
+			return 0
+		return np.sqrt(self.m2 / self.count)
+
+
+class RangeIndex(object):
+	"""
+	Index answering the stats of any range of values without scanning it:
+	prefix sums of the values and of their squares give the count, mean and
+	std, and a sparse table over the min/max of blocks of values gives the
+	min/max, only the partial blocks at both ends are scanned. Values are
+	shifted by their mean before being summed to keep the squares accurate.
+	"""
+	BLOCK_SIZE = 256
+
+	def __init__(self, data: np.ndarray) -> None:
 		self.data = data
+		self.count = len(data)
+		self.shift = data.mean(dtype=np.float64) if len(data) > 0 else 0.0
+		# sums are accumulated in float64 whatever the dtype of the data
+		shifted = data.astype(np.float64) - self.shift
+		self.sums = np.concatenate(([0.0], np.cumsum(shifted)))
+		self.square_sums = np.concatenate(([0.0], np.cumsum(np.square(shifted))))
+		blocks = data[:len(data) // self.BLOCK_SIZE * self.BLOCK_SIZE].reshape(-1, self.BLOCK_SIZE)
+		# level k holds the min/max of 2**k blocks starting at each block
+		self.min_table = [blocks.min(axis=1)]
+		self.max_table = [blocks.max(axis=1)]
+		width = 1
+		while width * 2 <= len(blocks):
+			self.min_table.append(np.minimum(self.min_table[-1][:-width], self.min_table[-1][width:]))
+			self.max_table.append(np.maximum(self.max_table[-1][:-width], self.max_table[-1][width:]))
+			width *= 2
+
+	def get_stats(self, begin: int, end: int) -> SeriesStats:
+		"""
+		Stats of values [begin, end).
+		"""
+		count = end - begin
+		if count <= 0:
+			return SeriesStats()
+		total = self.sums[end] - self.sums[begin]
+		square_total = self.square_sums[end] - self.square_sums[begin]
+		mean = self.shift + total / count
+		m2 = max(square_total - total * total / count, 0.0) if count > 1 else 0.0
+
+		first_block = -(-begin // self.BLOCK_SIZE)
+		last_block = end // self.BLOCK_SIZE
+		if first_block >= last_block:
+			values = self.data[begin:end]
+			return SeriesStats(count, values.min(), values.max(), mean, m2)
+		level = int(last_block - first_block).bit_length() - 1
+		other = last_block - (1 << level)
+		minimum = min(self.min_table[level][first_block], self.min_table[level][other])
+		maximum = max(self.max_table[level][first_block], self.max_table[level][other])
+		for values in (self.data[begin:first_block * self.BLOCK_SIZE], self.data[last_block * self.BLOCK_SIZE:end]):
+			if len(values) > 0:
+				minimum = min(minimum, values.min())
+				maximum = max(maximum, values.max())
+		return SeriesStats(count, minimum, maximum, mean, m2)
+
+
+def as_array(values, dtype=None) -> np.ndarray:
+	if values is None:
+		return np.empty(0, dtype=np.int64 if dtype is None else dtype)
+	return np.asarray(values, dtype=dtype)
+
+
+class TimeSeries(object):
+	__slots__ = ('timestamp', 'data', 'stats', 'digest', 'range_index', 'unit', 'better')
+
+	def __init__(self, timestamp_ns: list, data: list, unit: str, better: Better, dtype=None) -> None:
+		"""
+		timestamp should in nanoseconds. The data is kept as float32 if dtype
+		is np.float32 or the time_series.float32 config is set.
+		"""
+		if dtype is None and config["time_series.float32"]:
+			dtype = np.float32
+		self.timestamp = RegularColumn.from_array(as_array(timestamp_ns, np.int64))
+		self.data = Column.from_array(as_array(data), dtype)
+		# stats of the first stats.count samples, the data is only appended to
+		self.stats = SeriesStats()
+		# quantile sketch of the first digest.count samples
+		self.digest = TDigest()
+		self.range_index = None
 		self.unit = unit
 		self.better = better
-		if self.timestamp is None:
-			self.timestamp = []
 
 	def add_data(self, timestamp: list, data: list) -> None:
 		if len(timestamp) != len(data):
 			raise ValueError("Timestamp and data must have the same length")
-		self.timestamp += timestamp
-		self.data += data
+		self.timestamp.extend(timestamp)
+		self.data.extend(data)
 
 	def add_one_data(self, timestamp, data) -> None:
-		if len(self.timestamp) > 0 and timestamp is None:
-			message = f"Ignoring timestamp of series, original length of timestamp is {len(self.timestamp)}"
-			self.timestamp = []
+		timestamp_count = self.timestamp.size
+		if timestamp_count > 0 and timestamp is None:
+			message = f"Ignoring timestamp of series, original length of timestamp is {timestamp_count}"
+			self.timestamp = RegularColumn()
 			raise ValueError(message)
-		if timestamp is not None and len(self.timestamp) == len(self.data):
+		if timestamp is not None and timestamp_count == self.data.size:
 			self.timestamp.append(timestamp)
+			timestamp_count += 1
 		self.data.append(data)
-		if len(self.timestamp) > 0 and len(self.data) != len(self.timestamp):
+		if timestamp_count > 0 and self.data.size != timestamp_count:
 			raise ValueError(f"Timestamp and data must have the same length, otherwise timestamp should be empty, adding timestamp {timestamp}, data {data}")
 
+	def extend(self, series: "TimeSeries") -> None:
+		"""
+		Append all samples of another series. Timestamps are kept only if both
+		series have them.
+		"""
+		if len(self.data) == 0:
+			self.timestamp = RegularColumn.from_array(series.get_raw_timestamp())
+		elif not self.is_timestamp_valid() or not series.is_timestamp_valid():
+			self.timestamp = RegularColumn()
+		else:
+			self.timestamp.extend(series.get_raw_timestamp())
+		if self.digest.count == len(self.data) and series.digest.count == len(series.data):
+			self.digest.merge(series.digest)
+		self.data.extend(series.get_data_series())
+
+	def get_raw_timestamp(self) -> np.array:
+		"""
+		Timestamps as stored, empty if the series has none.
+		"""
+		return self.timestamp.view()
+
 	def count(self) -> int:
 		return len(self.data)
 
 	def is_timestamp_valid(self) -> bool:
-		return self.timestamp is not None and len(self.timestamp) > 0
+		return len(self.timestamp) > 0
 
-	def get_timestamp_series(self) -> np.array:
+	def get_timestamp_column(self) -> Column:
+		"""
+		Column of the timestamps, or of the sample numbers standing in for
+		missing timestamps.
+		"""
 		if self.is_timestamp_valid():
-			return np.array(self.timestamp, dtype=np.int64)
-		else:
-			return np.arange(len(self.data))
+			return self.timestamp
+		return RegularColumn(start=0, step=1, size=len(self.data))
+
+	def get_timestamp_series(self) -> np.array:
+		return self.get_timestamp_column().view()
 
 	def get_data_series(self) -> np.array:
-		return np.array(self.data)
+		return self.data.view()
 
 	def get_unit(self) -> str:
 		return self.unit
@@ -62,60 +475,318 @@ class TimeSeries(object):
 	def get_better(self) -> Better:
 		return self.better
 
+	def get_stats(self) -> SeriesStats:
+		"""
+		Summary of the data, computed once and then only updated with the
+		samples appended since.
+		"""
+		if self.stats.count < len(self.data):
+			self.stats = self.stats.merge(SeriesStats.of(self.get_data_series()[self.stats.count:]))
+		return self.stats
+
+	def get_digest(self) -> TDigest:
+		"""
+		Quantile sketch of the data, only updated with the samples appended
+		since the last call.
+		"""
+		if self.digest.count < len(self.data):
+			self.digest.update(self.get_data_series()[self.digest.count:])
+		return self.digest
+
+	def get_range_index(self) -> RangeIndex:
+		"""
+		RangeIndex of the data, built on first use and again once more data is
+		appended.
+		"""
+		if self.range_index is None or self.range_index.count != len(self.data):
+			self.range_index = RangeIndex(self.get_data_series())
+		return self.range_index
+
+	def find_window(self, start, end):
+		"""
+		Index range [begin, end) of the samples slice(start, end) keeps.
+		"""
+		return find_window(self.get_timestamp_column(), start, end)
+
+	def get_window_stats(self, begin: int, end: int) -> SeriesStats:
+		"""
+		Stats of samples [begin, end), from the range index unless that is the
+		whole series.
+		"""
+		if begin == 0 and end == len(self.data):
+			return self.get_stats()
+		return self.get_range_index().get_stats(begin, end)
+
 	def calc_average(self) -> float:
 		if len(self.data) == 0:
 			return 0
-		return sum(self.data) / len(self.data)
+		return self.get_stats().mean
 
 	def calc_max(self):
 		if len(self.data) == 0:
 			return 0
-		return max(self.data)
+		return self.get_stats().maximum
 
 	def calc_min(self):
 		if len(self.data) == 0:
 			return 0
-		return min(self.data)
+		return self.get_stats().minimum
 
 	def calc_best(self):
 		if len(self.data) == 0:
 			return 0
 		if self.better == Better.HIGHER:
-			return max(self.data)
+			return self.calc_max()
 		else:
-			return min(self.data)
+			return self.calc_min()
 
 	def calc_worst(self):
 		if len(self.data) == 0:
 			return 0
 		if self.better == Better.HIGHER:
-			return min(self.data)
+			return self.calc_min()
 		else:
-			return max(self.data)
+			return self.calc_max()
 
 	def calc_std(self) -> float:
+		return self.get_stats().get_std()
+
+	def calc_percentile(self, percent: float) -> float:
 		if len(self.data) == 0:
 			return 0
-		return np.std(self.data)
+		return self.get_digest().quantile(percent / 100)
 
 	def slice(self, start: int, end: int) -> "TimeSeries":
+		"""
+		Samples with start <= timestamp < end, as a series sharing the arrays of
+		this one.
+		"""
+		if start is None and end is None or start == end:
+			return self
+		begin, end_index = self.find_window(start, end)
+		logger.debug('slice from %s to %s, index from %s to %s', start, end, begin, end_index)
+		series = TimeSeries(None, self.get_data_series()[begin:end_index], self.unit, self.better)
+		series.timestamp = self.get_timestamp_column().slice(begin, end_index)
+		return series
+
+	def resample(self, grid=None, period=None, agg="mean") -> "TimeSeries":
+		"""
+		Series on the sorted timestamps of grid, or on a grid of the given period
+		covering this series, see make_grid. The value at each grid timestamp
+		aggregates the samples up to the next one with agg, one of RESAMPLE_AGGS,
+		and is zero if there are none. The last grid step repeats the one before.
+		"""
+		if agg not in RESAMPLE_AGGS:
+			raise ValueError(f"Unknown aggregation {agg}, candidates: {', '.join(RESAMPLE_AGGS)}")
+		if len(self.data) > 0 and not self.is_timestamp_valid():
+			raise ValueError("Cannot resample a series without timestamps")
+		if grid is None:
+			grid = make_grid([self], period)
+		grid = as_array(grid, np.int64)
+		timestamps = self.get_raw_timestamp()
+		data = self.get_data_series()
+		if np.any(timestamps[1:] < timestamps[:-1]):
+			order = np.argsort(timestamps, kind='stable')
+			timestamps = timestamps[order]
+			data = data[order]
+		bounds = np.searchsorted(timestamps, grid)
+		if len(grid) > 1:
+			end = np.searchsorted(timestamps, 2 * grid[-1] - grid[-2])
+		else:
+			end = len(timestamps)
+		counts = np.diff(np.append(bounds, end))
+		present = counts > 0
+		data = data[:end]
+		# reduce the non-empty bins only, their starts are valid indexes and
+		# each one ends where the next one starts
+		starts = bounds[present]
+		if len(starts) == 0:
+			reduced = data[:0].astype(np.float64 if agg == "mean" else data.dtype)
+		elif agg == "last":
+			reduced = data[starts + counts[present] - 1]
+		elif agg == "max":
+			reduced = np.maximum.reduceat(data, starts)
+		elif agg == "min":
+			reduced = np.minimum.reduceat(data, starts)
+		else:
+			reduced = np.add.reduceat(data, starts)
+			if agg == "mean":
+				reduced = reduced / counts[present]
+		values = np.zeros(len(grid), dtype=reduced.dtype)
+		values[present] = reduced
+		return TimeSeries(grid, values, self.unit, self.better)
+
+
+class LazySeries(object):
+	"""
+	Handle of a TimeSeries that is only loaded, by calling load, when its
+	samples are first used. The unit, better and, if given, count are known
+	without loading it. Everything else is forwarded to the loaded series.
+	"""
+	__slots__ = ('name', 'unit', 'better', 'sample_count', 'load', 'series')
+
+	def __init__(self, name: str, unit: str, better: Better, count, load) -> None:
+		self.name = name
+		self.unit = unit
+		self.better = better
+		self.sample_count = count
+		self.load = load
+		self.series = None
+
+	def get(self) -> TimeSeries:
+		if self.series is None:
+			logger.debug('loading series %s', self.name)
+			self.series = self.load()
+			self.load = None
+		return self.series
+
+	def get_unit(self) -> str:
+		return self.unit
+
+	def get_better(self) -> Better:
+		return self.better
+
+	def count(self) -> int:
+		if self.sample_count is None:
+			return self.get().count()
+		return self.sample_count
+
+	def slice(self, start, end) -> "LazySeries":
 		if start is None and end is None or start == end:
 			return self
+		return LazySeries(self.name, self.unit, self.better, None, lambda: self.get().slice(start, end))
+
+	def __getattr__(self, name):
+		return getattr(self.get(), name)
+
+
+def find_window(timestamps: Column, start, end):
+	"""
+	Index range [begin, end) of the sorted timestamps with start <= timestamp
+	< end, everything if start == end. Without start or end, the range starts
+	at 0 or ends before the last timestamp.
+	"""
+	if start is None and end is None or start == end or len(timestamps) == 0:
+		return 0, len(timestamps)
+	if start is None:
+		start = 0
+	if end is None:
+		end = timestamps.last()
+	begin, end = timestamps.search((start, end))
+	return begin, min(len(timestamps), end)
 
-		timestamps = self.get_timestamp_series()
-		if timestamps is None:
-			timestamps = np.arange(len(self.data))
 
-		if start is None:
-			start = 0
-		if end is None:
-			end = timestamps[-1]
-		print(f'slice from {start} to {end}')
+RESAMPLE_AGGS = ("mean", "max", "min", "last", "sum")
 
-		start_idx, end_idx = np.searchsorted(timestamps, (start, end))
-		end_idx = min(len(timestamps), end_idx)
-		print(f'slice index from {start_idx} to {end_idx}')
-		timestamp_segment = timestamps[start_idx:end_idx]
-		data_segment = self.data[start_idx:end_idx]
 
-		return TimeSeries(timestamp_segment, data_segment, self.unit, self.better)	
\ No newline at end of file
+def make_grid(series: list, period: int) -> np.ndarray:
+	"""
+	Timestamps every period nanoseconds, aligned to multiples of period, from
+	the first to the last timestamp of all the series with timestamps.
+	"""
+	if period is None or period <= 0:
+		raise ValueError(f"Resampling period must be positive, got {period}")
+	first = None
+	last = None
+	for s in series:
+		if not s.is_timestamp_valid():
+			continue
+		timestamps = s.get_raw_timestamp()
+		first = timestamps.min() if first is None else min(first, timestamps.min())
+		last = timestamps.max() if last is None else max(last, timestamps.max())
+	if first is None:
+		return np.empty(0, dtype=np.int64)
+	return np.arange(first // period * period, last + 1, period, dtype=np.int64)
+
+
+def align_data(series: TimeSeries, timestamp: Column, length: int):
+	"""
+	Values of series at the timestamps of the column, zero where the series has no
+	data. A series sampled at other times is linearly interpolated, and is
+	considered present up to half its sampling step beyond its first and last
+	sample. Without timestamps, samples are aligned by index over length
+	points. Returns the values and a mask of the points where the series is
+	present, or None if it is present everywhere.
+	"""
+	data = series.get_data_series()
+	if series.is_timestamp_valid() and timestamp is not None:
+		same_times = series.timestamp.same_prefix(timestamp, min(len(series.timestamp), length))
+	else:
+		same_times = True
+	if same_times:
+		if len(data) >= length:
+			return data[:length], None
+		values = np.zeros(length, dtype=data.dtype)
+		values[:len(data)] = data
+		return values, np.arange(length) < len(data)
+
+	series_timestamp = series.get_raw_timestamp()
+	timestamp = timestamp.view()
+	if np.any(series_timestamp[1:] < series_timestamp[:-1]):
+		order = np.argsort(series_timestamp, kind='stable')
+		series_timestamp = series_timestamp[order]
+		data = data[order]
+	margin = get_margin(series_timestamp)
+	present = (timestamp >= series_timestamp[0] - margin) & (timestamp <= series_timestamp[-1] + margin)
+	index = np.minimum(np.searchsorted(series_timestamp, timestamp), len(series_timestamp) - 1)
+	if np.array_equal(series_timestamp[index[present]], timestamp[present]):
+		# every point is a sample of the series, no need to interpolate
+		values = np.zeros(length, dtype=data.dtype)
+		values[present] = data[index[present]]
+	else:
+		values = np.where(present, np.interp(timestamp, series_timestamp, data), 0)
+	return values, present
+
+
+def get_margin(timestamp: np.ndarray):
+	"""
+	Half the mean sampling step of sorted timestamps, how far beyond its first
+	and last sample a series is considered present.
+	"""
+	return (timestamp[-1] - timestamp[0]) / max(len(timestamp) - 1, 1) / 2
+
+
+def combine_series(series: list, average=False) -> TimeSeries:
+	"""
+	Sum, or average if asked, of any number of series on the timestamps of the
+	first one, extended with the timestamps of the others out of its span so
+	that none is cut, see align_data. Each series is zero where it is not
+	present and the average at each point is over the series present there.
+	Unit and better are those of the first series.
+	"""
+	first = series[0]
+	if first.is_timestamp_valid():
+		timestamp = first.timestamp
+		first_timestamp = first.get_raw_timestamp()
+		lowest = first_timestamp.min()
+		highest = first_timestamp.max()
+		margin = get_margin(np.sort(first_timestamp))
+		outside = []
+		for s in series[1:]:
+			if s.is_timestamp_valid():
+				t = s.get_raw_timestamp()
+				outside.append(t[(t < lowest - margin) | (t > highest + margin)])
+		if any(len(t) > 0 for t in outside):
+			timestamp = RegularColumn.from_array(np.union1d(first_timestamp, np.concatenate(outside)))
+		length = len(timestamp)
+	else:
+		timestamp = None
+		length = max(s.count() for s in series)
+	total = None
+	count = 0
+	for s in series:
+		values, present = align_data(s, timestamp, length)
+		if total is None:
+			total = values.copy()
+		elif total.dtype != np.result_type(total, values):
+			total = total + values
+		else:
+			total += values
+		if average:
+			count = count + (1 if present is None else present)
+	if average and len(series) > 1:
+		total = total / np.maximum(count, 1)
+	combined = TimeSeries(None, total, first.get_unit(), first.get_better())
+	if timestamp is not None:
+		combined.timestamp = timestamp.slice(0, length)
+	return combined
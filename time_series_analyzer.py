@@ -2,19 +2,27 @@ import os, sys
 import argparse
 import re
 import glob
-import tkinter as tk
+import time
+import logging
 from scenario_importer import ScenarioImporter
-from time_series_viewer import TimeSeriesViewerManager
+from scenario_parsers import PARSERS
 from config import config
-from time_series_selector import TimeSeriesSelector
 import ppmf_importer
+import chipvi_importer
 import csv_exporter
 import series_importer_exporter
+import binary_series
+import parallel_importer
+from series_cache import SeriesCache
+from series_store import SeriesStore
+from time_series import RESAMPLE_AGGS, make_grid
 
 
 def filter_series(all_series, filter_string):
 	if len(filter_string) == 0:
 		return all_series
+	if isinstance(all_series, SeriesStore):
+		return all_series.filter(filter_string)
 	filtered_series = {}
 	for key in all_series:
 		search = re.search(filter_string, key)
@@ -24,12 +32,65 @@ def filter_series(all_series, filter_string):
 
 
 def slice_serices(all_series, start, end):
+	if isinstance(all_series, SeriesStore):
+		return all_series.slice(start, end)
 	new_series = {}
 	for k, v in all_series.items():
 		new_series[k] = v.slice(start, end)
 	return new_series
 
 
+def resample_series(all_series, period, agg):
+	"""
+	Resample all series onto one grid of the given period, series without
+	timestamps are dropped.
+	"""
+	new_series = {}
+	for k, v in all_series.items():
+		if v.count() > 0 and not v.is_timestamp_valid():
+			print(f'Skipping {k} without timestamps for resampling')
+			continue
+		new_series[k] = v
+	grid = make_grid(new_series.values(), period)
+	for k, v in new_series.items():
+		new_series[k] = v.resample(grid, agg=agg)
+	return SeriesStore.from_series(new_series)
+
+
+def print_statistics(all_series):
+	for k in sorted(all_series):
+		print(f'{k} count {all_series[k].count()}')
+		unit = all_series[k].get_unit()
+		print(f'{k} avg   {all_series[k].calc_average():.2f} {unit}')
+		print(f'{k} worst {all_series[k].calc_worst():.2f} {unit}')
+		print(f'{k} best  {all_series[k].calc_best():.2f} {unit}')
+		print(f'{k} std  {all_series[k].calc_std():.2f} {unit}')
+		for percent in (50, 95, 99):
+			print(f'{k} p{percent}   {all_series[k].calc_percentile(percent):.2f} {unit}')
+		print('=' * 80)
+
+
+def follow_files(importer, files, interval, filter_string, start, end):
+	"""
+	Import what is appended to the scenario logs and print the statistics every
+	interval seconds while there is new data, until interrupted.
+	"""
+	try:
+		while True:
+			updated = False
+			for path, offset in files:
+				updated |= importer.follow_from_path(path, offset=offset)
+			if updated:
+				all_series = filter_series(importer.get_all_series(), filter_string)
+				all_series = slice_serices(all_series, start, end)
+				print(f'Statistics at {time.strftime("%H:%M:%S")}')
+				print('=' * 80)
+				print_statistics(all_series)
+			time.sleep(interval)
+	except KeyboardInterrupt:
+		pass
+
+
 if __name__ == "__main__":
 	parser = argparse.ArgumentParser()
 	parser.add_argument("-o", "--output", type=str, default="", help="Output directory")
@@ -39,24 +100,47 @@ if __name__ == "__main__":
 	parser.add_argument("-s", "--start", type=int, default=None, help="start timestamp")
 	parser.add_argument("-e", "--end", type=int, default=None, help="end timestamp")
 	parser.add_argument("-c", "--convert", type=str, nargs='?', default="", help="Convert to standard data format, argument is prefix")
-	parser.add_argument("-i", "--input_format", type=str, default="unknown", help="Input format (candidates: scenario, series, ppmf)")
+	parser.add_argument("-i", "--input_format", type=str, default="unknown", help="Input format (candidates: scenario, series, binary, ppmf, chipvi_bin)")
+	parser.add_argument("--binary", action="store_true", help="Convert to the binary series format, the output file is given by -o")
 	parser.add_argument("--group", action="store_true", help="Automatically group series")
 	parser.add_argument("--beat_size", type=int, default=0, help="Bus beat size")
+	parser.add_argument("-j", "--jobs", type=int, default=1, help="Number of processes to import files in parallel, 0 for one per core. A single large scenario log is split into chunks")
+	parser.add_argument("--cache_dir", type=str, default=config["cache.dir"], help="Directory of the parsed series cache")
+	parser.add_argument("--no_cache", action="store_true", help="Do not use the parsed series cache")
+	parser.add_argument("--parsers", type=str, default=None, help=f"Comma separated scenario log parsers whose series are kept, all by default (candidates: {', '.join(PARSERS)})")
+	parser.add_argument("--follow", type=float, nargs='?', const=5.0, default=None, help="Keep importing what is appended to scenario logs and print statistics every FOLLOW seconds (default 5)")
+	parser.add_argument("--resample", type=int, default=None, help="Resample all series onto a shared grid of RESAMPLE ns, -o also saves them as series.csv")
+	parser.add_argument("--resample_agg", type=str, default="mean", choices=RESAMPLE_AGGS, help="How samples are aggregated when resampling")
+	parser.add_argument("--float32", action="store_true", help="Keep series data as float32 to halve its memory")
+	parser.add_argument("--debug", action="store_true", help="Print debug logs")
 	parser.add_argument('input_files', nargs='+', help='List of files to process.')
 	args = parser.parse_args()
+	logging.basicConfig(level=logging.DEBUG if args.debug else logging.WARNING, format='%(name)s: %(message)s')
 
 	config["bus.beat_size"] = args.beat_size
 	config["selector.auto_group"] = args.group
+	config["time_series.float32"] = args.float32
+	if args.parsers is not None:
+		config["scenario_importer.parsers"] = args.parsers.split(',')
+		for name in config["scenario_importer.parsers"]:
+			if name not in PARSERS:
+				print(f'Unknown parser {name}, candidates: {", ".join(PARSERS)}')
+				sys.exit(1)
 
 	if args.input_format == "series":
 		importer = series_importer_exporter.SeriesImporter()
 	elif args.input_format == "scenario":
 		importer = ScenarioImporter()
+	elif args.input_format == "binary":
+		importer = binary_series.BinarySeriesImporter()
 	elif args.input_format == "ppmf":
 		importer = ppmf_importer.PPMFImporter()
+	elif args.input_format == "chipvi_bin":
+		importer = chipvi_importer.ChipviImporter()
 	else:
 		importer = None
 	
+	files = []
 	for file in args.input_files:
 		splited = file.split('#')
 		file = splited[0]
@@ -69,30 +153,88 @@ if __name__ == "__main__":
 				args.input_files.append(os.path.join(path, "*"))
 				continue
 			else:
+				files.append((path, offset))
+
+	# Guess importer if not specified
+	if importer is None and len(files) > 0:
+		if binary_series.is_binary_series(files[0][0]):
+			importer = binary_series.BinarySeriesImporter()
+		elif chipvi_importer.is_chipvi(files[0][0]):
+			importer = chipvi_importer.ChipviImporter()
+		elif files[0][0].endswith(".series"):
+			importer = series_importer_exporter.SeriesImporter()
+		else:
+			importer = ScenarioImporter()
+
+	if args.follow is not None:
+		if not isinstance(importer, ScenarioImporter):
+			print('--follow is only supported for scenario logs')
+			sys.exit(1)
+		follow_files(importer, files, args.follow, args.filter, args.start, args.end)
+		sys.exit(0)
+
+	all_series = None
+	# binary series files are read in place, caching them would only copy them
+	if not args.no_cache and len(files) > 0 and not isinstance(importer, binary_series.BinarySeriesImporter):
+		cache = SeriesCache(args.cache_dir, config["cache.max_size"], config["cache.max_age"])
+		cache_key = cache.make_key(importer, files)
+		all_series = cache.load(cache_key, lazy=True)
+		if all_series is not None:
+			print(f'Loaded {len(all_series)} series from cache {cache.get_path(cache_key)}')
+	else:
+		cache = None
+
+	if all_series is None:
+		if args.jobs != 1 and len(files) > 1:
+			parallel_importer.import_files(importer, files, args.jobs)
+		else:
+			for path, offset in files:
 				print(f'Importing from {path}, offset={offset}')
-				# Guess importer if not specified
-				if importer is None:
-					if path.endswith(".series"):
-						importer = series_importer_exporter.SeriesImporter()
-					else:
-						importer = ScenarioImporter()
-				importer.import_from_path(path, offset=offset)
+				if isinstance(importer, ScenarioImporter):
+					importer.import_from_path(path, offset=offset, jobs=args.jobs)
+				else:
+					importer.import_from_path(path, offset=offset)
+		all_series = importer.get_all_series()
+		# the importer is not used anymore, the series it returned are only held
+		# by all_series so the store frees them as it copies them
+		importer = None
+		if cache is not None:
+			all_series = SeriesStore.from_series(all_series, release=True)
+			cache.store(cache_key, all_series)
 	print('=' * 80)
 	viewer = []
 
-	all_series = importer.get_all_series()
+	# series loaded from the cache are only read once used, so listing and
+	# filtering do not load any
 	all_series = filter_series(all_series, args.filter)
-	all_series = slice_serices(all_series, args.start, args.end)
 	if args.list:
 		print('Listing series:')
 		for k in sorted(all_series):
 			print(k)
 		sys.exit(0)
+	if not args.gui:
+		# the store keeps the series compactly
+		all_series = SeriesStore.from_series(all_series, release=True)
+	all_series = slice_serices(all_series, args.start, args.end)
+	if args.resample is not None:
+		all_series = resample_series(all_series, args.resample, args.resample_agg)
 
 	if args.convert != "":
-		series_importer_exporter.save(args.output, all_series, args.convert)
+		if args.binary:
+			if args.output == "":
+				print('--binary needs the output file given by -o')
+				sys.exit(1)
+			binary_series.save(args.output, all_series, args.convert)
+		else:
+			series_importer_exporter.save(args.output, all_series, args.convert)
 		sys.exit(0)
 
+	# matplotlib and astropy take seconds to import, only do it for plotting
+	if args.output != "" or args.gui:
+		import tkinter as tk
+		from time_series_viewer import TimeSeriesViewerManager
+		from time_series_selector import TimeSeriesSelector
+
 	if args.output != "":
 		viewer_mgr = TimeSeriesViewerManager(None)
 		args.output = os.path.normpath(args.output)
@@ -100,6 +242,8 @@ if __name__ == "__main__":
 			os.makedirs(args.output)
 		print(f'Saving csv results')
 		csv_exporter.save(os.path.join(args.output, "result.csv"), all_series)
+		if args.resample is not None:
+			csv_exporter.save_table(os.path.join(args.output, "series.csv"), all_series)
 		for k, v in all_series.items():
 			print(f'Saving figure for {k}')
 			viewer_mgr.add_seperated_viewer(k, v)
@@ -114,12 +258,5 @@ if __name__ == "__main__":
 		root.mainloop()
 		sys.exit(0)
 
-	for k in sorted(all_series):
-		print(f'{k} count {all_series[k].count()}')
-		unit = all_series[k].get_unit()
-		print(f'{k} avg   {all_series[k].calc_average():.2f} {unit}')
-		print(f'{k} worst {all_series[k].calc_worst():.2f} {unit}')
-		print(f'{k} best  {all_series[k].calc_best():.2f} {unit}')
-		print(f'{k} std  {all_series[k].calc_std():.2f} {unit}')
-		print('=' * 80)
+	print_statistics(all_series)
 
@@ -213,6 +213,14 @@ class TimeSeriesSelector(tk.Frame):
 		chk = ttk.Checkbutton(right_frame, text="Hide original series", variable=self.hide_original_series)
 		chk.pack(side=tk.TOP, padx=5, anchor=tk.NW)
 
+		decimation_frame = tk.Frame(right_frame)
+		decimation_frame.pack(side=tk.TOP, padx=5, anchor=tk.NW)
+		label = ttk.Label(decimation_frame, text="Decimation ")
+		label.pack(side=tk.LEFT)
+		self.decimation = ttk.Combobox(decimation_frame, values=["minmax", "lttb", "none"])
+		self.decimation.set(config["plot.decimation"])
+		self.decimation.pack(side=tk.LEFT)
+
 		confirm_button = ttk.Button(right_frame, text="Confirm", command=self.confirm_selection)
 		confirm_button.pack(side=tk.BOTTOM, padx=(0, 5), anchor=tk.SW)
 
@@ -267,6 +275,7 @@ class TimeSeriesSelector(tk.Frame):
 			config["plot.moving_average_window"] = 0
 
 		config["plot.hide_original_series"] = self.hide_original_series.get()
+		config["plot.decimation"] = self.decimation.get()
 
 		try:
 			for option in selected_series:
@@ -7,6 +7,7 @@ from matplotlib.offsetbox import AnchoredText
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2Tk
 from astropy.timeseries import LombScargle
 from config import config
+from decimation import DecimationPyramid, decimate
 
 class TimeSeriesViewerManager:
 	def __init__(self, parent):
@@ -329,8 +330,10 @@ class TimeSeriesViewer(TimeSeriesViewerBase):
 		self.time_unit = None
 		self.unit = ""
 		self.lines = []
+		# plotted samples of each line, decimated for the current x range
 		self.x = []
 		self.y = []
+		self.pyramids = []
 		self.all_series = all_series
 		for name, series in all_series.items():
 			print(f"plotting {name}")
@@ -343,18 +346,14 @@ class TimeSeriesViewer(TimeSeriesViewerBase):
 				raise ValueError(f"All series must have the same timestamp unit. {self.time_unit} vs. {time_unit}")
 
 			if not config["plot.hide_original_series"]:
-				self.lines += self.ax.plot(timestamps, data, label=f"{name} ({series.get_unit()})", marker=config["plot.marker"])
-				self.x.append(timestamps)
-				self.y.append(data)
+				self.plot(timestamps, data, f"{name} ({series.get_unit()})")
 
 			maw = config["plot.moving_average_window"]
 			if maw > 0:
 				maw = min(len(timestamps), maw)
 				kernel = np.ones(maw) / maw
 				ma_data = np.convolve(data, kernel, mode='same')
-				self.lines += self.ax.plot(timestamps, ma_data, label=f"{name} ma({maw}) ({series.get_unit()})", marker=config["plot.marker"])
-				self.x.append(timestamps)
-				self.y.append(ma_data)
+				self.plot(timestamps, ma_data, f"{name} ma({maw}) ({series.get_unit()})")
 
 			if self.unit == "":
 				self.unit = series.get_unit()
@@ -373,6 +372,7 @@ class TimeSeriesViewer(TimeSeriesViewerBase):
 			self.name = "combined"
 			self.set_window_title("Combined Viewer")
 
+		self.ax.callbacks.connect('xlim_changed', self.on_xlim_changed)
 		self.span = SpanSelector(self.ax, self.on_select, 'horizontal', useblit=True,
 									props=dict(alpha=0.3, facecolor='blue'), interactive=True, button=1)
 		self.show_information_pane()
@@ -381,6 +381,27 @@ class TimeSeriesViewer(TimeSeriesViewerBase):
 	def on_close(self, event):
 		self.get_mgr().remove_seperated_viewer(self.name)
 
+	def plot(self, timestamps, data, label):
+		pyramid = DecimationPyramid(timestamps, data)
+		x, y = decimate(pyramid, 0, len(data), self.get_plot_points(), config["plot.decimation"])
+		self.lines += self.ax.plot(x, y, label=label, marker=config["plot.marker"])
+		self.x.append(x)
+		self.y.append(y)
+		self.pyramids.append(pyramid)
+
+	def get_plot_points(self):
+		return max(100, int(self.ax.bbox.width))
+
+	def on_xlim_changed(self, ax):
+		points = self.get_plot_points()
+		for i, pyramid in enumerate(self.pyramids):
+			begin, end = pyramid.find_range(*ax.get_xlim())
+			x, y = decimate(pyramid, begin, end, points, config["plot.decimation"])
+			self.lines[i].set_data(x, y)
+			self.x[i] = x
+			self.y[i] = y
+		self.canvas.draw_idle()
+
 	def get_lines(self):
 		return self.lines
 
@@ -394,21 +415,12 @@ class TimeSeriesViewer(TimeSeriesViewerBase):
 		self.show_statistics(xmin, xmax)
 
 	def calculate_statistics(self, series, start_ns, end_ns):
-		sliced_series = series.slice(start_ns, end_ns)
-		min_bandwidth = sliced_series.calc_min()
-		max_bandwidth = sliced_series.calc_max()
-		mean_bandwidth = sliced_series.calc_average()
-		std_bandwidth = sliced_series.calc_std()
-		sliced_timestamp = sliced_series.get_timestamp_series()
-		if len(sliced_timestamp) == 0:
-			start = 0
-			end = 0
-			cnt = 0
-		else:
-			start = sliced_timestamp[0]
-			end = sliced_timestamp[-1]
-			cnt = len(sliced_timestamp)
-		return min_bandwidth, max_bandwidth, mean_bandwidth, std_bandwidth, start, end, cnt
+		begin, end = series.find_window(start_ns, end_ns)
+		stats = series.get_window_stats(begin, end)
+		if stats.count == 0:
+			return 0, 0, 0, 0, 0, 0, 0
+		timestamps = series.get_timestamp_series()
+		return stats.minimum, stats.maximum, stats.mean, stats.get_std(), timestamps[begin], timestamps[end - 1], stats.count
 
 	def show_statistics(self, start_ns, end_ns):
 		text = "Statistics:\n"